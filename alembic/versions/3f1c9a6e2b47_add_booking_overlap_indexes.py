@@ -0,0 +1,48 @@
+"""Add composite indexes for booking overlap queries
+
+Revision ID: 3f1c9a6e2b47
+Revises: b320f522791a
+Create Date: 2026-10-16 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f1c9a6e2b47'
+down_revision: Union[str, Sequence[str], None] = 'b320f522791a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Create composite indexes matching the time-range overlap predicates."""
+    op.create_index(
+        'ix_appointment_technician_links_tech_time',
+        'appointment_technician_links',
+        ['technician_id', 'start_time', 'end_time'],
+        unique=False
+    )
+    op.create_index(
+        'ix_appointment_resource_links_resource_time',
+        'appointment_resource_links',
+        ['resource_id', 'start_time', 'end_time'],
+        unique=False
+    )
+    # MySQL 不支持部分索引，将 is_cancelled 作为等值列放在范围列之前
+    op.create_index(
+        'ix_shifts_tech_location_active_start',
+        'shifts',
+        ['technician_id', 'location_id', 'is_cancelled', 'start_time'],
+        unique=False
+    )
+
+
+def downgrade() -> None:
+    """Drop the booking overlap indexes."""
+    op.drop_index('ix_shifts_tech_location_active_start', table_name='shifts')
+    op.drop_index('ix_appointment_resource_links_resource_time', table_name='appointment_resource_links')
+    op.drop_index('ix_appointment_technician_links_tech_time', table_name='appointment_technician_links')
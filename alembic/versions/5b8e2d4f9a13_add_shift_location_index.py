@@ -0,0 +1,34 @@
+"""Add location-scoped index for shift range queries
+
+Revision ID: 5b8e2d4f9a13
+Revises: 3f1c9a6e2b47
+Create Date: 2026-10-16 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b8e2d4f9a13'
+down_revision: Union[str, Sequence[str], None] = '3f1c9a6e2b47'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Create a composite index for per-location shift range scans."""
+    # 地点日历按 location_id = ? AND is_cancelled = 0 AND start_time < ? 查询，不带 technician_id
+    op.create_index(
+        'ix_shifts_location_active_start',
+        'shifts',
+        ['location_id', 'is_cancelled', 'start_time'],
+        unique=False
+    )
+
+
+def downgrade() -> None:
+    """Drop the per-location shift index."""
+    op.drop_index('ix_shifts_location_active_start', table_name='shifts')
@@ -0,0 +1,35 @@
+"""Drop single-column shift indexes covered by composite indexes
+
+Revision ID: 9c4e1a7b3d52
+Revises: 5b8e2d4f9a13
+Create Date: 2026-10-16 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9c4e1a7b3d52'
+down_revision: Union[str, Sequence[str], None] = '5b8e2d4f9a13'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Drop indexes whose columns lead an existing composite index."""
+    # technician_id / location_id 分别是 ix_shifts_tech_location_active_start、
+    # ix_shifts_location_active_start 的最左列，外键仍有可用索引
+    op.drop_index('ix_shifts_technician_id', table_name='shifts')
+    op.drop_index('ix_shifts_location_id', table_name='shifts')
+    # 布尔列区分度过低，查询已通过复合索引中的 is_cancelled 列过滤
+    op.drop_index('ix_shifts_is_cancelled', table_name='shifts')
+
+
+def downgrade() -> None:
+    """Recreate the single-column shift indexes."""
+    op.create_index('ix_shifts_is_cancelled', 'shifts', ['is_cancelled'], unique=False)
+    op.create_index('ix_shifts_location_id', 'shifts', ['location_id'], unique=False)
+    op.create_index('ix_shifts_technician_id', 'shifts', ['technician_id'], unique=False)
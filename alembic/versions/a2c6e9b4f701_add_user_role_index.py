@@ -0,0 +1,28 @@
+"""Add index on users.role
+
+Revision ID: a2c6e9b4f701
+Revises: d7a3f5c1e8b6
+Create Date: 2026-10-16 16:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a2c6e9b4f701'
+down_revision: Union[str, Sequence[str], None] = 'd7a3f5c1e8b6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Index users.role for technician/admin filters."""
+    op.create_index(op.f('ix_users_role'), 'users', ['role'], unique=False)
+
+
+def downgrade() -> None:
+    """Drop the users.role index."""
+    op.drop_index(op.f('ix_users_role'), table_name='users')
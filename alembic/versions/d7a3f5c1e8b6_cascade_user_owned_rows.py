@@ -0,0 +1,52 @@
+"""Cascade user-owned shifts and social accounts at the database level
+
+Revision ID: d7a3f5c1e8b6
+Revises: 9c4e1a7b3d52
+Create Date: 2026-10-16 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd7a3f5c1e8b6'
+down_revision: Union[str, Sequence[str], None] = '9c4e1a7b3d52'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (表, 外键列, 新约束名)；原约束由 MySQL 自动命名，需按列从数据库中查出
+CASCADE_FOREIGN_KEYS = (
+    ('shifts', 'technician_id', 'fk_shifts_technician_user'),
+    ('social_accounts', 'user_id', 'fk_social_accounts_user'),
+)
+
+
+def _find_foreign_key_name(table: str, column: str) -> str | None:
+    inspector = inspect(op.get_bind())
+    for foreign_key in inspector.get_foreign_keys(table):
+        if foreign_key['constrained_columns'] == [column] and foreign_key['referred_table'] == 'users':
+            return foreign_key['name']
+    return None
+
+
+def _replace_foreign_key(table: str, column: str, name: str, ondelete: str | None) -> None:
+    existing_name = _find_foreign_key_name(table, column)
+    if existing_name:
+        op.drop_constraint(existing_name, table, type_='foreignkey')
+    op.create_foreign_key(name, table, 'users', [column], ['uid'], ondelete=ondelete)
+
+
+def upgrade() -> None:
+    """Recreate the user foreign keys with ON DELETE CASCADE."""
+    for table, column, name in CASCADE_FOREIGN_KEYS:
+        _replace_foreign_key(table, column, name, 'CASCADE')
+
+
+def downgrade() -> None:
+    """Recreate the user foreign keys without cascading deletes."""
+    for table, column, name in CASCADE_FOREIGN_KEYS:
+        _replace_foreign_key(table, column, name, None)
@@ -15,7 +15,7 @@ from src.shared.models.resource_models import (
     resource_service_link_table,
 )
 from src.shared.models.schedule_models import Shift
-from sqlalchemy.orm import joinedload
+from sqlalchemy.orm import joinedload, selectinload
 from src.modules.auth.security import get_current_admin_user # 2. 导入管理员依赖
 from src.shared.models.user_models import User, technician_service_link_table # 3. 导入 User (用于类型注解)
 from src.shared.models.appointment_models import Appointment, AppointmentResourceLink
@@ -64,6 +64,7 @@ async def create_location(
     db.add(new_location)
     await db.commit()
     await db.refresh(new_location)
+    schedule_service.invalidate_locations_cache()
     
     return new_location
 
@@ -121,6 +122,7 @@ async def update_location(
     db.add(db_location)
     await db.commit()
     await db.refresh(db_location)
+    schedule_service.invalidate_locations_cache()
     
     return db_location
 
@@ -176,6 +178,7 @@ async def delete_location(
 
     await db.delete(db_location)
     await db.commit()
+    schedule_service.invalidate_locations_cache()
 
     return Response(status_code=status.HTTP_204_NO_CONTENT)
 
@@ -319,6 +322,7 @@ async def delete_service(
     db_service.resources = []
     await db.delete(db_service)
     await db.commit()
+    schedule_service.invalidate_capability_cache()
 
     return Response(status_code=status.HTTP_204_NO_CONTENT)
 
@@ -381,6 +385,7 @@ async def create_resource(
 
     db.add(new_resource)
     await db.commit()
+    schedule_service.invalidate_capability_cache()
     # 确保关联关系在返回前已加载，避免 Lazy Load 触发 MissingGreenlet
     await db.refresh(new_resource, attribute_names=["location", "services"])
     
@@ -490,6 +495,7 @@ async def update_resource(
         
     db.add(db_resource)
     await db.commit()
+    schedule_service.invalidate_capability_cache()
     await db.refresh(db_resource, ["location", "services"]) # 确保关联关系被刷新
     
     return db_resource
@@ -535,6 +541,7 @@ async def delete_resource(
     db_resource.services = []
     await db.delete(db_resource)
     await db.commit()
+    schedule_service.invalidate_capability_cache()
 
     return Response(status_code=status.HTTP_204_NO_CONTENT)
 
@@ -672,6 +679,7 @@ async def assign_service_to_technician(
     
     db.add(db_technician)
     await db.commit()
+    schedule_service.invalidate_capability_cache()
     await db.refresh(db_technician, ["service"]) # 刷新关系
     
     return db_technician
@@ -728,6 +736,7 @@ async def remove_service_from_technician(
     
     db.add(db_technician)
     await db.commit()
+    schedule_service.invalidate_capability_cache()
     await db.refresh(db_technician, ["service"])
     
     return db_technician
@@ -863,9 +872,10 @@ async def get_shifts(
     """
     query = (
         select(Shift)
+        # 排序列表使用 selectinload，避免 JOIN 改写外层排序查询
         .options(
-            joinedload(Shift.technician), # 预加载技师信息
-            joinedload(Shift.location)    # 预加载地点信息
+            selectinload(Shift.technician), # 预加载技师信息
+            selectinload(Shift.location)    # 预加载地点信息
         )
         .order_by(Shift.start_time)
     )
@@ -897,7 +907,6 @@ async def get_shifts(
 async def get_technician_shift_calendar_for_admin(
     technician_uid: str,
     days: int = Query(14, ge=1, le=schedule_service.MAX_SHIFT_PLAN_DAYS, description="返回未来多少天的排班"),
-    include_cancelled: bool = Query(False, description="是否包含已取消排班"),
     db: AsyncSession = Depends(get_db),
     admin_user: User = Depends(get_current_admin_user)
 ):
@@ -911,8 +920,7 @@ async def get_technician_shift_calendar_for_admin(
     return await schedule_service.get_technician_shift_calendar(
         db=db,
         technician=technician,
-        days=days,
-        include_cancelled=include_cancelled
+        days=days
     )
 
 
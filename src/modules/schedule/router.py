@@ -96,7 +96,6 @@ async def create_new_appointment(
 )
 async def get_my_shifts(
     days: int = Query(14, ge=1, le=60, description="返回未来多少天的排班"),
-    include_cancelled: bool = Query(False, description="是否包含已取消的排班"),
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
@@ -106,8 +105,7 @@ async def get_my_shifts(
     return await schedule_service.get_technician_shift_calendar(
         db=db,
         technician=current_user,
-        days=days,
-        include_cancelled=include_cancelled
+        days=days
     )
 
 
@@ -151,11 +149,7 @@ async def get_schedule_locations(
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    locations = await schedule_service.list_schedule_locations(db)
-    return [
-        schemas.LocationOption(uid=loc.uid, name=loc.name or '未命名地点')
-        for loc in locations
-    ]
+    return await schedule_service.list_schedule_locations(db)
 
 
 @router.get(
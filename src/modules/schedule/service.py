@@ -1,20 +1,26 @@
 # src/modules/schedule/service.py
 
+from bisect import bisect_left, bisect_right
 from collections import defaultdict
+from dataclasses import dataclass
+from functools import lru_cache
+from itertools import groupby
+from operator import itemgetter
 from datetime import date, datetime, time, timedelta, timezone
-from types import SimpleNamespace
+from time import monotonic
 from typing import Iterable
+import ulid
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy.orm import joinedload
-from sqlalchemy import and_, or_, func
+from sqlalchemy.orm import joinedload, selectinload
+from sqlalchemy import func, exists, insert, literal, literal_column, null, union_all
 
-from src.shared.models.resource_models import Service, Resource, Location
-from src.shared.models.user_models import User
+from src.shared.models.resource_models import Service, Resource, Location, resource_service_link_table
+from src.shared.models.user_models import User, technician_service_link_table
 from src.shared.models.schedule_models import Shift
 from src.shared.models.appointment_models import AppointmentTechnicianLink, AppointmentResourceLink, Appointment
 
-from .schemas import AppointmentCreate
+from .schemas import AppointmentCreate, LocationOption
 
 # 默认的时间槽长度（分钟）
 DEFAULT_SLOT_INTERVAL_MINUTES = 60
@@ -27,7 +33,21 @@ DEFAULT_SHIFT_PERIODS = {
 LOCAL_TIMEZONE = timezone(timedelta(hours=8), 'Asia/Shanghai')
 MAX_SHIFT_PLAN_DAYS = 30
 DEFAULT_CALENDAR_DAYS = 14
-WEEKDAY_NAMES = ['周一', '周二', '周三', '周四', '周五', '周六', '周日']
+WEEKDAY_NAMES = ('周一', '周二', '周三', '周四', '周五', '周六', '周日')
+# 地点列表的进程内缓存时长（秒），地点增删改时主动失效
+LOCATIONS_CACHE_TTL_SECONDS = 300
+
+# 技师/房间可服务项目关系的进程内缓存时长（秒），关系变更时主动失效
+CAPABILITY_CACHE_TTL_SECONDS = 60
+
+_LOCATIONS_CACHE: tuple[float, tuple[LocationOption, ...]] | None = None
+_CAPABILITY_CACHE: tuple[float, "ServiceCapabilities"] | None = None
+_LOCAL_UTC_OFFSET_SECONDS = int(LOCAL_TIMEZONE.utcoffset(None).total_seconds())
+# (开始钟点, 结束钟点) -> 班次时段，用于由排班时间反推时段
+_PERIOD_BY_LOCAL_TIMES = {
+    (config["start"], config["end"]): key
+    for key, config in DEFAULT_SHIFT_PERIODS.items()
+}
 
 # --- 辅助函数：时间范围重叠 ---
 def is_overlap(range1_start, range1_end, range2_start, range2_end):
@@ -35,6 +55,37 @@ def is_overlap(range1_start, range1_end, range2_start, range2_end):
     # 确保比较的是同类型（例如都是 aware datetime）
     return range1_start < range2_end and range1_end > range2_start
 
+def merge_sorted_slots(runs: Iterable[Iterable[int]]) -> list[int]:
+    """合并多个时间槽（整数时间戳）序列并去重，结果保持升序。"""
+    # 整数的哈希与比较都在 C 层完成，集合去重后排序比逐个归并的 Python 循环更快
+    return sorted(set().union(*runs))
+
+IntervalIndex = tuple[list[int], list[int]]
+
+_EMPTY_INTERVAL_INDEX: IntervalIndex = ([], [])
+
+def build_interval_index(intervals: Iterable[tuple[int, int]]) -> IntervalIndex:
+    """
+    将 [start, end) 整数区间按开始时间排序，并记录结束时间的前缀最大值。
+    返回 (starts, max_ends)，供 has_overlap 做二分查找。
+    """
+    starts: list[int] = []
+    max_ends: list[int] = []
+    running_end: int | None = None
+    for start, end in sorted(intervals):
+        if running_end is None or end > running_end:
+            running_end = end
+        starts.append(start)
+        max_ends.append(running_end)
+    return starts, max_ends
+
+def has_overlap(index: IntervalIndex, start: int, end: int) -> bool:
+    """检查 [start, end) 是否与索引中的任一区间重叠。"""
+    starts, max_ends = index
+    # 只有开始时间早于 end 的区间才可能重叠，其中最晚的结束时间晚于 start 即为冲突
+    upper = bisect_left(starts, end)
+    return upper > 0 and max_ends[upper - 1] > start
+
 def get_slot_interval_minutes(service: Service) -> int:
     """
     获取服务对应的时间槽步长（分钟），预留未来扩展。
@@ -51,7 +102,82 @@ def get_slot_interval_minutes(service: Service) -> int:
     return DEFAULT_SLOT_INTERVAL_MINUTES
 
 
+@dataclass(frozen=True)
+class ServiceTimings:
+    """
+    服务的时间参数（秒）。
+    room_duration_s 已处理零时长：房间无占用时按一个时间槽步长计算。
+    """
+    slot_step_s: int
+    tech_duration_s: int
+    room_duration_s: int
+
+    @property
+    def tech_duration(self) -> timedelta:
+        return timedelta(seconds=self.tech_duration_s)
+
+    @property
+    def room_duration(self) -> timedelta:
+        return timedelta(seconds=self.room_duration_s)
+
+
+def _compute_service_timings(
+    slot_step_minutes: int,
+    technician_minutes: int,
+    room_minutes: int,
+    buffer_minutes: int
+) -> ServiceTimings:
+    slot_step_s = slot_step_minutes * 60
+    room_duration_s = (room_minutes + buffer_minutes) * 60
+    return ServiceTimings(
+        slot_step_s=slot_step_s,
+        tech_duration_s=(technician_minutes + buffer_minutes) * 60,
+        room_duration_s=room_duration_s or slot_step_s,
+    )
+
+
+@lru_cache(maxsize=1024)
+def _compute_package_timings(
+    service_durations: tuple[tuple[int, int | None, int | None, int | None], ...]
+) -> ServiceTimings:
+    """
+    套餐的时间参数：步长取各服务中最小的有效步长，技师/房间占用为各服务累加。
+    service_durations 为每个服务的 (步长, 技师时长, 房间时长, 缓冲时长)，以分钟计。
+    """
+    slot_interval_candidates = [interval for interval, _, _, _ in service_durations if interval > 0]
+    slot_step_minutes = min(slot_interval_candidates) if slot_interval_candidates else DEFAULT_SLOT_INTERVAL_MINUTES
+
+    total_tech_minutes = 0
+    total_room_minutes = 0
+    for _, technician_minutes, room_minutes, buffer_minutes in service_durations:
+        buffer_time = max(buffer_minutes or 0, 0)
+        total_tech_minutes += max(technician_minutes or 0, 0) + buffer_time
+        total_room_minutes += max(room_minutes or 0, 0) + buffer_time
+
+    slot_step_s = slot_step_minutes * 60
+    if total_tech_minutes == 0 and total_room_minutes == 0:
+        return ServiceTimings(slot_step_s=slot_step_s, tech_duration_s=slot_step_s, room_duration_s=slot_step_s)
+
+    return ServiceTimings(
+        slot_step_s=slot_step_s,
+        tech_duration_s=total_tech_minutes * 60,
+        room_duration_s=total_room_minutes * 60,
+    )
+
+
+def get_service_timings(service: Service) -> ServiceTimings:
+    """计算服务的时间步长与技师/房间占用时长。"""
+    return _compute_service_timings(
+        get_slot_interval_minutes(service),
+        service.technician_operation_duration,
+        service.room_operation_duration,
+        service.buffer_time,
+    )
+
+
+@lru_cache(maxsize=2048)
 def compute_period_window(target_date: date, period: str) -> tuple[datetime, datetime]:
+    """班次时段的起止时间，输入只有 (日期, 时段) 且结果不可变，可安全缓存。"""
     config = DEFAULT_SHIFT_PERIODS.get(period)
     if not config:
         raise ValueError(f"未知班次时段: {period}")
@@ -67,23 +193,392 @@ def infer_shift_period(start: datetime, end: datetime) -> str | None:
         return None
     local_start = start.astimezone(LOCAL_TIMEZONE)
     local_end = end.astimezone(LOCAL_TIMEZONE)
-    for key, config in DEFAULT_SHIFT_PERIODS.items():
-        expected_start = datetime.combine(local_start.date(), config["start"], tzinfo=LOCAL_TIMEZONE)
-        expected_end = datetime.combine(local_start.date(), config["end"], tzinfo=LOCAL_TIMEZONE)
-        if local_start == expected_start and local_end == expected_end:
-            return key
-    return None
+    if local_start.date() != local_end.date():
+        return None
+    # 直接比较本地钟点，无需为每个时段构造当天的 datetime
+    return _PERIOD_BY_LOCAL_TIMES.get((local_start.time(), local_end.time()))
 
 
 def normalize_local_date(dt: datetime) -> date:
     return dt.astimezone(LOCAL_TIMEZONE).date()
+
+
+def ensure_timezone(dt: datetime) -> datetime:
+    """数据库返回的无时区时间按业务本地时区处理。"""
+    return dt if dt.tzinfo else dt.replace(tzinfo=LOCAL_TIMEZONE)
+
+
+def to_epoch_seconds(dt: datetime) -> int:
+    """转换为整数时间戳（秒），热点循环中的区间比较只做整数比较。"""
+    # 每行数据都会调用，时区补全直接内联，省去一次函数调用
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=LOCAL_TIMEZONE)
+    return int(dt.timestamp())
+
+
+_MINUTES_PER_DAY = 1440
+# 一天内每分钟对应的 'HH:MM' 标签，输出时间槽时按分钟下标直接取用
+MINUTE_LABELS = tuple(f"{minute // 60:02d}:{minute % 60:02d}" for minute in range(_MINUTES_PER_DAY))
+
+
+def format_local_clock(epoch_seconds: int) -> str:
+    """将整数时间戳格式化为本地 'HH:MM'，业务时区为固定偏移，直接按秒数查表。"""
+    return MINUTE_LABELS[(epoch_seconds + _LOCAL_UTC_OFFSET_SECONDS) % 86400 // 60]
+
+
+_FULL_DAY_MINUTE_MASK = (1 << _MINUTES_PER_DAY) - 1
+# 以一天中的分钟数为位下标，每隔 60 位置 1，截取低位即得连续若干个整点槽
+_HOURLY_STRIDE_BITS = sum(1 << (60 * hour) for hour in range(24))
+
+
+def hourly_slot_mask(start_ts: int, end_ts: int) -> int:
+    """
+    从开始时间起每隔一小时一个时间槽（不含结束时间），按本地分钟数编码为位掩码。
+    跨零点的部分折回当天低位，合并多个排班只需按位或。
+    """
+    if end_ts <= start_ts:
+        return 0
+    count = min(-(-(end_ts - start_ts) // 3600), 24)
+    start_minute = (start_ts + _LOCAL_UTC_OFFSET_SECONDS) % 86400 // 60
+    bits = (_HOURLY_STRIDE_BITS & ((1 << (60 * count)) - 1)) << start_minute
+    return (bits | (bits >> _MINUTES_PER_DAY)) & _FULL_DAY_MINUTE_MASK
+
+
+def slot_mask_labels(mask: int) -> list[str]:
+    """位掩码转为 'HH:MM' 标签，按位从低到高输出即为时间顺序。"""
+    return [MINUTE_LABELS[minute] for minute in _iter_set_bits(mask)]
+
+
+def build_period_window_index(
+    start_date: date,
+    days: int
+) -> dict[tuple[datetime, datetime], tuple[date, str]]:
+    """
+    预先计算日期范围内每个班次时段的起止时间，并反向索引到 (日期, 时段)。
+    排班时间与某个时段完全一致时，可直接查表得到其所属日期和时段。
+    """
+    index: dict[tuple[datetime, datetime], tuple[date, str]] = {}
+    for offset in range(days):
+        current_date = start_date + timedelta(days=offset)
+        for period_key in DEFAULT_SHIFT_PERIODS:
+            index[compute_period_window(current_date, period_key)] = (current_date, period_key)
+    return index
+
+
+def shift_lasts_at_least(seconds: int):
+    """排班时长不少于指定秒数的过滤条件，在数据库端计算（MySQL TIMESTAMPDIFF）。"""
+    return func.timestampdiff(literal_column("SECOND"), Shift.start_time, Shift.end_time) >= seconds
+
+
+def invalidate_capability_cache() -> None:
+    """技师技能或房间可服务项目发生变更后调用，清空进程内的能力缓存。"""
+    global _CAPABILITY_CACHE
+    _CAPABILITY_CACHE = None
+
+
+@dataclass(frozen=True)
+class ServiceCapabilities:
+    """
+    技师/房间可做服务的位掩码表示：每个服务分配一个比特位，
+    “是否能做全部所需服务”只需一次按位与比较。
+    """
+    service_bits: dict[str, int]
+    technician_masks: dict[str, int]
+    resource_masks: dict[str, int]
+
+    def required_mask(self, service_uids: Iterable[str]) -> int | None:
+        """所需服务的位掩码；若有服务没有任何技师或房间关联，返回 None。"""
+        mask = 0
+        for uid in service_uids:
+            bit = self.service_bits.get(uid)
+            if bit is None:
+                return None
+            mask |= bit
+        return mask
+
+
+def qualify_by_mask(masks: dict[str, int], required_mask: int) -> list[str]:
+    """返回能做全部所需服务（位掩码包含 required_mask）的技师或房间 ID，保持原有顺序。"""
+    return [uid for uid, mask in masks.items() if (mask & required_mask) == required_mask]
+
+
+async def load_service_capabilities(db: AsyncSession) -> ServiceCapabilities:
+    """
+    返回技师与房间的可做服务位掩码。
+    只读取两张关联表的 ID 列，结果在进程内缓存，避免每次查询可用时间都加载全部技师与服务。
+    """
+    global _CAPABILITY_CACHE
+    cached = _CAPABILITY_CACHE
+    if cached and monotonic() - cached[0] < CAPABILITY_CACHE_TTL_SECONDS:
+        return cached[1]
+
+    statement = union_all(
+        select(
+            literal("technician").label("kind"),
+            technician_service_link_table.c.user_id.label("owner_id"),
+            technician_service_link_table.c.service_id
+        ),
+        select(
+            literal("resource").label("kind"),
+            resource_service_link_table.c.resource_id.label("owner_id"),
+            resource_service_link_table.c.service_id
+        )
+    )
+    service_bits: dict[str, int] = {}
+    technician_masks: dict[str, int] = defaultdict(int)
+    resource_masks: dict[str, int] = defaultdict(int)
+    for kind, owner_id, service_id in (await db.execute(statement)).all():
+        bit = service_bits.get(service_id)
+        if bit is None:
+            bit = service_bits[service_id] = 1 << len(service_bits)
+        target = technician_masks if kind == "technician" else resource_masks
+        target[owner_id] |= bit
+
+    capabilities = ServiceCapabilities(
+        service_bits=service_bits,
+        technician_masks=dict(technician_masks),
+        resource_masks=dict(resource_masks)
+    )
+    _CAPABILITY_CACHE = (monotonic(), capabilities)
+    return capabilities
+
+
+def _hold_epoch_seconds(value) -> int:
+    if not isinstance(value, datetime):
+        value = datetime.fromisoformat(str(value))
+    return to_epoch_seconds(value)
+
+
+def hold_to_interval(hold) -> tuple[int, int]:
+    """将临时占用（holds）的起止时间转换为整数时间戳区间，只在入口处解析一次。"""
+    return _hold_epoch_seconds(hold.start_time), _hold_epoch_seconds(hold.end_time)
+
+
+async def load_booking_indexes(
+    db: AsyncSession,
+    technician_ids: list[str],
+    resource_ids: list[str],
+    range_start: datetime,
+    range_end: datetime,
+    holds: list | None = None
+) -> tuple[dict[str, IntervalIndex], dict[str, IntervalIndex]]:
+    """
+    取回技师与房间在时间范围内的占用，并入临时占用（holds）后直接建立区间索引。
+    返回 (技师占用索引, 房间占用索引)，均按 ID 分组。
+    """
+    tech_bookings_map, room_bookings_map = await load_booking_intervals(
+        db, technician_ids, resource_ids, range_start, range_end
+    )
+
+    for hold in holds or ():
+        interval = hold_to_interval(hold)
+        if hold.technician_uid:
+            tech_bookings_map[hold.technician_uid].append(interval)
+        if hold.resource_uid:
+            room_bookings_map[hold.resource_uid].append(interval)
+
+    return (
+        {uid: build_interval_index(items) for uid, items in tech_bookings_map.items()},
+        {uid: build_interval_index(items) for uid, items in room_bookings_map.items()}
+    )
+
+
+async def load_booking_intervals(
+    db: AsyncSession,
+    technician_ids: list[str],
+    resource_ids: list[str],
+    range_start: datetime,
+    range_end: datetime
+) -> tuple[dict[str, list[tuple[int, int]]], dict[str, list[tuple[int, int]]]]:
+    """
+    通过一次 UNION ALL 查询取回技师与房间在时间范围内的占用区间（整数时间戳）。
+    返回 (技师占用, 房间占用)，均按 ID 分组。
+    """
+    tech_bookings_map: dict[str, list[tuple[int, int]]] = defaultdict(list)
+    room_bookings_map: dict[str, list[tuple[int, int]]] = defaultdict(list)
+
+    queries = []
+    if technician_ids:
+        queries.append(
+            select(
+                literal("technician").label("kind"),
+                AppointmentTechnicianLink.technician_id.label("owner_id"),
+                AppointmentTechnicianLink.start_time,
+                AppointmentTechnicianLink.end_time
+            ).join(
+                Appointment, Appointment.uid == AppointmentTechnicianLink.appointment_id
+            ).where(
+                AppointmentTechnicianLink.technician_id.in_(technician_ids),
+                AppointmentTechnicianLink.start_time < range_end,
+                AppointmentTechnicianLink.end_time > range_start,
+                Appointment.status != 'cancelled'
+            )
+        )
+    if resource_ids:
+        queries.append(
+            select(
+                literal("resource").label("kind"),
+                AppointmentResourceLink.resource_id.label("owner_id"),
+                AppointmentResourceLink.start_time,
+                AppointmentResourceLink.end_time
+            ).join(
+                Appointment, Appointment.uid == AppointmentResourceLink.appointment_id
+            ).where(
+                AppointmentResourceLink.resource_id.in_(resource_ids),
+                AppointmentResourceLink.start_time < range_end,
+                AppointmentResourceLink.end_time > range_start,
+                Appointment.status != 'cancelled'
+            )
+        )
+    if not queries:
+        return tech_bookings_map, room_bookings_map
+
+    statement = union_all(*queries) if len(queries) > 1 else queries[0]
+    # 由数据库按 (类型, ID, 开始时间) 排好序，分组时每组只需整体转换一次
+    statement = statement.order_by("kind", "owner_id", "start_time")
+    rows = (await db.execute(statement)).all()
+    for (kind, owner_id), group in groupby(rows, key=itemgetter(0, 1)):
+        target = tech_bookings_map if kind == "technician" else room_bookings_map
+        target[owner_id].extend(
+            (to_epoch_seconds(start_time), to_epoch_seconds(end_time))
+            for _, _, start_time, end_time in group
+        )
+
+    return tech_bookings_map, room_bookings_map
+
+
+def build_slot_runs(
+    shift_intervals: Iterable[tuple[int, int]],
+    day_start_ts: int,
+    day_end_ts: int,
+    span_s: int,
+    step_s: int
+) -> list[range]:
+    """
+    为每段排班生成当天的候选开始时间（整数时间戳的 range，本身升序）。
+    span_s 为时间槽需要完整落在排班内的时长。
+    """
+    slot_runs: list[range] = []
+    for shift_start, shift_end in shift_intervals:
+        window_start = max(shift_start, day_start_ts)
+        window_end = min(shift_end, day_end_ts)
+        if window_end <= window_start:
+            continue
+
+        last_start = window_end - span_s
+        if last_start < window_start:
+            continue
+
+        slot_runs.append(range(window_start, last_start + 1, step_s))
+    return slot_runs
+
+
+def iter_merged_intervals(index: IntervalIndex) -> Iterable[tuple[int, int]]:
+    """按开始时间依次产出索引中互相重叠的区间合并后的结果（首尾相接的区间不合并）。"""
+    starts, max_ends = index
+    segment_start: int | None = None
+    for position, start in enumerate(starts):
+        if segment_start is None:
+            segment_start = start
+        elif start >= max_ends[position - 1]:
+            yield segment_start, max_ends[position - 1]
+            segment_start = start
+    if segment_start is not None:
+        yield segment_start, max_ends[-1]
+
+
+def _slot_range_mask(low: int, high: int) -> int:
+    """候选时间槽下标 [low, high) 对应的位掩码。"""
+    return ((1 << (high - low)) - 1) << low if high > low else 0
+
+
+def _iter_set_bits(mask: int) -> Iterable[int]:
+    while mask:
+        lowest = mask & -mask
+        yield lowest.bit_length() - 1
+        mask ^= lowest
+
+
+def busy_slot_mask(slot_starts: list[int], index: IntervalIndex, duration_s: int) -> int:
+    """
+    与索引中任一占用冲突的时间槽位掩码。
+    时间槽 [s, s + duration) 与占用 [start, end) 冲突当且仅当 start - duration < s < end，
+    在有序的 slot_starts 上是一段连续下标。
+    """
+    mask = 0
+    for start, end in iter_merged_intervals(index):
+        mask |= _slot_range_mask(
+            bisect_right(slot_starts, start - duration_s),
+            bisect_left(slot_starts, end)
+        )
+    return mask
+
+
+def covered_slot_mask(slot_starts: list[int], intervals: Iterable[tuple[int, int]], duration_s: int) -> int:
+    """可被某一段排班完整容纳的时间槽位掩码：start <= s 且 s + duration <= end。"""
+    mask = 0
+    for start, end in intervals:
+        mask |= _slot_range_mask(
+            bisect_left(slot_starts, start),
+            bisect_right(slot_starts, end - duration_s)
+        )
+    return mask
+
+
+def match_package_slots(
+    slot_starts: list[int],
+    tech_entries: list[tuple[list[tuple[int, int]], IntervalIndex]],
+    room_indexes: list[IntervalIndex],
+    tech_duration_s: int,
+    room_duration_s: int
+) -> list[tuple[int, int, int]]:
+    """
+    为每个候选时间槽按顺序匹配第一个可用的技师与房间。
+    slot_starts 须升序；tech_entries 为每位技师的 (排班区间, 预约索引)，只处理整数，不接触 ORM 对象。
+    每位技师/房间的可用性以位掩码表示（第 i 位对应第 i 个时间槽），
+    由排班与占用区间直接二分出下标范围，无需逐个时间槽检查。
+    返回 (时间槽开始, 技师下标, 房间下标)，按时间升序。
+    """
+    # 依次为尚未分配房间的时间槽分配第一个空闲房间
+    room_choice: dict[int, int] = {}
+    unassigned = (1 << len(slot_starts)) - 1
+    for room_position, room_index in enumerate(room_indexes):
+        if not unassigned:
+            break
+        free = unassigned & ~busy_slot_mask(slot_starts, room_index, room_duration_s)
+        for slot_position in _iter_set_bits(free):
+            room_choice[slot_position] = room_position
+        unassigned &= ~free
+
+    # 只在已有房间的时间槽中，依次分配第一个在班且空闲的技师
+    tech_choice: dict[int, int] = {}
+    unassigned = (1 << len(slot_starts)) - 1 & ~unassigned
+    for tech_position, (shift_intervals, booking_index) in enumerate(tech_entries):
+        if not unassigned:
+            break
+        if not shift_intervals:
+            continue
+        free = (
+            unassigned
+            & covered_slot_mask(slot_starts, shift_intervals, tech_duration_s)
+            & ~busy_slot_mask(slot_starts, booking_index, tech_duration_s)
+        )
+        for slot_position in _iter_set_bits(free):
+            tech_choice[slot_position] = tech_position
+        unassigned &= ~free
+
+    return [
+        (slot_starts[slot_position], tech_choice[slot_position], room_choice[slot_position])
+        for slot_position in sorted(tech_choice)
+    ]
 # --- 核心调度算法 ---
 
 async def get_available_slots(
     db: AsyncSession, 
     location_uid: str, 
     service_uid: str, 
-    target_date: date
+    target_date: date,
+    holds: list | None = None
 ) -> list[str]:
     
     # ----------------------------------------------------
@@ -96,15 +591,10 @@ async def get_available_slots(
     if not db_service:
         raise Exception("服务项目不存在") # 稍后在 router 层转为 HTTPException
 
-    slot_step_minutes = get_slot_interval_minutes(db_service)
-    slot_step_delta = timedelta(minutes=slot_step_minutes)
-
-    total_tech_duration = timedelta(minutes=(
-        db_service.technician_operation_duration + db_service.buffer_time
-    ))
-    total_room_duration = timedelta(minutes=(
-        db_service.room_operation_duration + db_service.buffer_time
-    ))
+    timings = get_service_timings(db_service)
+    slot_step_s = timings.slot_step_s
+    tech_duration_s = timings.tech_duration_s
+    room_duration_s = timings.room_duration_s
     
     # ----------------------------------------------------
     # 步骤 3: 确定日期的时间范围
@@ -115,180 +605,127 @@ async def get_available_slots(
     day_end = datetime.combine(target_date, time.max, tzinfo=LOCAL_TIMEZONE)
 
     # ----------------------------------------------------
-    # 步骤 4.1: 筛选合格的技师 (V6 逻辑)
+    # 步骤 4: 筛选合格的技师排班与房间（一次查询）
     # ----------------------------------------------------
-    # a. 找到能做该服务 (service_uid) 的所有技师
-    capable_tech_query = (
-        select(User)
-        .join(User.service)
-        .where(Service.uid == service_uid)
+    # a. 能做该服务 (service_uid)，且在 'target_date' 于 'location_uid' 有排班 (Shift) 的技师。
+    #    只取排班的 (技师, 开始, 结束) 三列，不构造 User/Shift 实体
+    capable_tech_ids = select(technician_service_link_table.c.user_id).where(
+        technician_service_link_table.c.service_id == service_uid
     )
-    capable_techs = (await db.execute(capable_tech_query)).scalars().all()
-    capable_tech_uids = [tech.uid for tech in capable_techs]
-
-    if not capable_tech_uids:
-        return [] # 没有任何技师能做这个服务
-
-    # b. 在这些技师中，找到在 'target_date' 于 'location_uid' 有排班 (Shift) 的人
-    # 并且预加载排班信息 (shifts)
-    shift_query = (
-        select(User)
-        .options(joinedload(User.shifts)) # 预加载排班
+    shift_candidates = (
+        select(
+            literal("technician").label("kind"),
+            Shift.technician_id.label("owner_id"),
+            Shift.start_time.label("start_time"),
+            Shift.end_time.label("end_time")
+        )
         .where(
-            User.uid.in_(capable_tech_uids),
-            User.shifts.any(
-                and_(
-                    Shift.location_id == location_uid,
-                    Shift.is_cancelled == False,
-                    Shift.start_time < day_end,
-                    Shift.end_time > day_start
-                )
-            )
+            Shift.technician_id.in_(capable_tech_ids),
+            Shift.location_id == location_uid,
+            Shift.is_cancelled == False,
+            Shift.start_time < day_end,
+            Shift.end_time > day_start,
+            shift_lasts_at_least(tech_duration_s)
         )
     )
-    qualified_technicians = (await db.execute(shift_query)).scalars().unique().all()
-    qualified_tech_uids = [tech.uid for tech in qualified_technicians]
-    
-    if not qualified_technicians:
-        return [] # 今天这个地点，没有能做这个服务的技师在上班
-
-    # ----------------------------------------------------
-    # 步骤 4.2: 筛选合格的房间
-    # ----------------------------------------------------
-    room_query = select(Resource).where(
-        Resource.location_id == location_uid,
-        Resource.services.any(Service.uid == service_uid)
+    # b. 该地点能做该服务的房间，只取 uid
+    capable_room_ids = select(resource_service_link_table.c.resource_id).where(
+        resource_service_link_table.c.service_id == service_uid
+    )
+    room_candidates = (
+        select(
+            literal("resource").label("kind"),
+            Resource.uid.label("owner_id"),
+            null().label("start_time"),
+            null().label("end_time")
+        )
+        .where(
+            Resource.location_id == location_uid,
+            Resource.uid.in_(capable_room_ids)
+        )
     )
-    qualified_rooms = (await db.execute(room_query)).scalars().all()
-    qualified_room_uids = [room.uid for room in qualified_rooms]
+    candidate_rows = (await db.execute(
+        union_all(shift_candidates, room_candidates).order_by("kind", "owner_id")
+    )).all()
+
+    # 按技师分组并转换为整数区间，后续步骤只使用这些区间
+    tech_shift_intervals: dict[str, list[tuple[int, int]]] = {}
+    qualified_room_uids: list[str] = []
+    for (kind, owner_id), group in groupby(candidate_rows, key=itemgetter(0, 1)):
+        if kind == "resource":
+            qualified_room_uids.append(owner_id)
+            continue
+        tech_shift_intervals[owner_id] = [
+            (to_epoch_seconds(start_time), to_epoch_seconds(end_time))
+            for _, _, start_time, end_time in group
+        ]
+    qualified_tech_uids = list(tech_shift_intervals)
+
+    if not qualified_tech_uids:
+        return [] # 今天这个地点，没有能做这个服务的技师在上班
 
-    if not qualified_rooms:
+    if not qualified_room_uids:
         return [] # 这个地点没有任何房间/床位
 
     # ----------------------------------------------------
-    # 步骤 5: 获取当天的所有现有预约
+    # 步骤 5: 获取当天技师与房间的所有现有预约（一次查询）
     # ----------------------------------------------------
-    
-    # a. 技师的预约
-    tech_bookings_query = select(AppointmentTechnicianLink).where(
-        AppointmentTechnicianLink.technician_id.in_(qualified_tech_uids),
-        AppointmentTechnicianLink.start_time < day_end,
-        AppointmentTechnicianLink.end_time > day_start
-    )
-    tech_bookings = (await db.execute(tech_bookings_query)).scalars().all()
-    tech_bookings_map = defaultdict(list)
-    for booking in tech_bookings:
-        tech_bookings_map[booking.technician_id].append(booking)
-
-    # b. 房间的预约
-    room_bookings_query = select(AppointmentResourceLink).where(
-        AppointmentResourceLink.resource_id.in_(qualified_room_uids),
-        AppointmentResourceLink.start_time < day_end,
-        AppointmentResourceLink.end_time > day_start
+    tech_booking_index, room_booking_index = await load_booking_indexes(
+        db, qualified_tech_uids, qualified_room_uids, day_start, day_end, holds
     )
-    room_bookings = (await db.execute(room_bookings_query)).scalars().all()
-    room_bookings_map = defaultdict(list)
-    for booking in room_bookings:
-        room_bookings_map[booking.resource_id].append(booking)
 
     # ----------------------------------------------------
     # 步骤 6: 基于排班生成候选时间槽
     # ----------------------------------------------------
-    candidate_slots: set[datetime] = set()
-    for tech in qualified_technicians:
-        for shift in getattr(tech, "shifts", []):
-            if getattr(shift, "is_cancelled", False):
-                continue
-            if shift.location_id != location_uid:
-                continue
-            if shift.end_time <= day_start or shift.start_time >= day_end:
-                continue
-
-            window_start = max(shift.start_time.astimezone(LOCAL_TIMEZONE), day_start)
-            window_end = min(shift.end_time.astimezone(LOCAL_TIMEZONE), day_end)
-            if window_end <= window_start:
-                continue
-
-            if total_tech_duration > timedelta(0):
-                last_start = window_end - total_tech_duration
-            else:
-                last_start = window_end - slot_step_delta
-
-            if last_start < window_start:
-                continue
-
-            current = window_start
-            while current <= last_start:
-                candidate_slots.add(current)
-                current += slot_step_delta
-
+    candidate_slots = merge_sorted_slots(
+        build_slot_runs(
+            (interval for intervals in tech_shift_intervals.values() for interval in intervals),
+            to_epoch_seconds(day_start),
+            to_epoch_seconds(day_end),
+            tech_duration_s if tech_duration_s > 0 else slot_step_s,
+            slot_step_s
+        )
+    )
     if not candidate_slots:
         return []
 
-    available_slots: list[str] = []
-    for slot_start in sorted(candidate_slots):
-        slot_start = slot_start.astimezone(LOCAL_TIMEZONE)
-        slot_end_for_tech = slot_start + total_tech_duration
-        slot_end_for_room = slot_start + total_room_duration
-
-        if total_tech_duration == timedelta():
-            slot_end_for_tech = slot_start
-
-        if total_room_duration == timedelta():
-            slot_end_for_room = slot_start + slot_step_delta
-
-        found_tech = False
-        for tech in qualified_technicians:
-            on_shift = any(
-                shift.location_id == location_uid and
-                shift.start_time <= slot_start and
-                shift.end_time >= (slot_end_for_tech if total_tech_duration > timedelta() else slot_start)
-                for shift in getattr(tech, "shifts", [])
-            )
-            if not on_shift:
-                continue
-
-            bookings = tech_bookings_map.get(tech.uid, [])
-            is_booked = any(
-                is_overlap(
-                    booking.start_time,
-                    booking.end_time,
-                    slot_start,
-                    slot_end_for_tech if total_tech_duration > timedelta() else slot_start
-                )
-                for booking in bookings
+    # ----------------------------------------------------
+    # 步骤 7: 以技师为外层循环标记有空闲技师的时间槽
+    # ----------------------------------------------------
+    # 第 i 位对应第 i 个候选时间槽；所有时间槽都已找到空闲技师后即可提前结束
+    all_slots_mask = (1 << len(candidate_slots)) - 1
+    free_tech_mask = 0
+    for tech_uid, shift_intervals in tech_shift_intervals.items():
+        free_tech_mask |= (
+            covered_slot_mask(candidate_slots, shift_intervals, tech_duration_s)
+            & ~busy_slot_mask(
+                candidate_slots,
+                tech_booking_index.get(tech_uid, _EMPTY_INTERVAL_INDEX),
+                tech_duration_s
             )
-            if is_booked:
-                continue
-
-            found_tech = True
+        )
+        if free_tech_mask == all_slots_mask:
             break
 
-        if not found_tech:
-            continue
-
-        found_room = False
-        for room in qualified_rooms:
-            bookings = room_bookings_map.get(room.uid, [])
-            is_booked = any(
-                is_overlap(
-                    booking.start_time,
-                    booking.end_time,
-                    slot_start,
-                    slot_end_for_room
-                )
-                for booking in bookings
-            )
-            if is_booked:
-                continue
-
-            found_room = True
+    # ----------------------------------------------------
+    # 步骤 8: 检查房间并输出
+    # ----------------------------------------------------
+    # 当天完全空闲的房间可满足任意时间槽，否则逐个房间合并空闲位
+    free_room_mask = 0
+    for room_uid in qualified_room_uids:
+        if room_uid not in room_booking_index:
+            free_room_mask = all_slots_mask
+            break
+        free_room_mask |= all_slots_mask & ~busy_slot_mask(
+            candidate_slots, room_booking_index[room_uid], room_duration_s
+        )
+        if free_room_mask == all_slots_mask:
             break
 
-        if not found_room:
-            continue
-
-        available_slots.append(slot_start.strftime('%H:%M'))
+    available_slots = [
+        format_local_clock(candidate_slots[slot_position])
+        for slot_position in _iter_set_bits(free_tech_mask & free_room_mask)
+    ]
 
     return available_slots
 
@@ -308,220 +745,185 @@ async def get_available_slots_for_package(
 
     service_uids = [service.uid for service in ordered_services]
 
-    slot_intervals = [get_slot_interval_minutes(service) for service in ordered_services]
-    slot_interval_candidates = [value for value in slot_intervals if value > 0]
-    slot_step_minutes = min(slot_interval_candidates) if slot_interval_candidates else DEFAULT_SLOT_INTERVAL_MINUTES
-    slot_step_delta = timedelta(minutes=slot_step_minutes)
-
-    total_tech_minutes = 0
-    total_room_minutes = 0
-    for service in ordered_services:
-        buffer_time = max(service.buffer_time or 0, 0)
-        total_tech_minutes += max(service.technician_operation_duration or 0, 0) + buffer_time
-        total_room_minutes += max(service.room_operation_duration or 0, 0) + buffer_time
-
-    total_tech_duration = timedelta(minutes=total_tech_minutes)
-    total_room_duration = timedelta(minutes=total_room_minutes)
-
-    if total_tech_duration == timedelta(0) and total_room_duration == timedelta(0):
-        total_tech_duration = slot_step_delta
-        total_room_duration = slot_step_delta
+    timings = _compute_package_timings(tuple(
+        (
+            get_slot_interval_minutes(service),
+            service.technician_operation_duration,
+            service.room_operation_duration,
+            service.buffer_time
+        )
+        for service in ordered_services
+    ))
+    slot_step_s = timings.slot_step_s
+    tech_duration_s = timings.tech_duration_s
+    room_duration_s = timings.room_duration_s
 
     day_start = datetime.combine(target_date, time.min, tzinfo=LOCAL_TIMEZONE)
     day_end = datetime.combine(target_date, time.max, tzinfo=LOCAL_TIMEZONE)
 
-    tech_query = (
-        select(User)
-        .options(joinedload(User.service))
-        .where(User.role.in_(("technician", "admin")))
-    )
-    if preferred_technician_uid:
-        tech_query = tech_query.where(User.uid == preferred_technician_uid)
-
-    technicians = (await db.execute(tech_query)).scalars().unique().all()
+    capabilities = await load_service_capabilities(db)
+    required_mask = capabilities.required_mask(service_uids)
+    if required_mask is None:
+        return []
 
-    qualified_technicians = []
-    for technician in technicians:
-        technician_service_uids = {service.uid for service in technician.service}
-        if set(service_uids).issubset(technician_service_uids):
-            qualified_technicians.append(technician)
+    if preferred_technician_uid:
+        # 指定技师时直接查表，无需遍历全部技师
+        preferred_mask = capabilities.technician_masks.get(preferred_technician_uid, 0)
+        capable_technician_ids = qualify_by_mask({preferred_technician_uid: preferred_mask}, required_mask)
+    else:
+        capable_technician_ids = qualify_by_mask(capabilities.technician_masks, required_mask)
 
-    if preferred_technician_uid and not qualified_technicians:
+    if not capable_technician_ids:
         return []
 
-    if not qualified_technicians:
+    capable_resource_ids = qualify_by_mask(capabilities.resource_masks, required_mask)
+    if not capable_resource_ids:
         return []
 
-    qualified_technician_ids = [technician.uid for technician in qualified_technicians]
-
-    resource_query = (
-        select(Resource)
-        .options(joinedload(Resource.location), joinedload(Resource.services))
-        .where(Resource.location_id == location_uid)
+    resource_query = select(Resource).where(
+        Resource.location_id == location_uid,
+        Resource.uid.in_(capable_resource_ids)
     )
-    resources = (await db.execute(resource_query)).scalars().unique().all()
-
-    qualified_resources = []
-    for resource in resources:
-        resource_service_uids = {service.uid for service in resource.services}
-        if set(service_uids).issubset(resource_service_uids):
-            qualified_resources.append(resource)
+    qualified_resources = (await db.execute(resource_query)).scalars().all()
 
     if not qualified_resources:
         return []
 
     qualified_resource_ids = [resource.uid for resource in qualified_resources]
 
+    # 技师与其当天排班在一次查询中取回：每行为 (技师, 排班开始, 排班结束)，
+    # 同一技师的多行共享身份映射中的同一个 User 对象
     shift_query = (
-        select(Shift)
-        .options(joinedload(Shift.technician), joinedload(Shift.location))
+        select(User, Shift.start_time, Shift.end_time)
+        .join(Shift, Shift.technician_id == User.uid)
         .where(
-            Shift.technician_id.in_(qualified_technician_ids),
+            User.uid.in_(capable_technician_ids),
+            User.role.in_(("technician", "admin")),
             Shift.location_id == location_uid,
             Shift.is_cancelled == False,
             Shift.start_time < day_end,
-            Shift.end_time > day_start
+            Shift.end_time > day_start,
+            # 容纳不下整个套餐的排班不会产生任何时间槽，直接在数据库端排除
+            shift_lasts_at_least(tech_duration_s)
         )
+        .order_by(Shift.technician_id, Shift.start_time)
     )
-    shifts = (await db.execute(shift_query)).scalars().all()
-
-    if not shifts:
-        return []
-
-    shift_map = defaultdict(list)
-    for shift in shifts:
-        shift_map[shift.technician_id].append(shift)
+    shift_rows = (await db.execute(shift_query)).all()
+
+    capable_technicians: list[User] = []
+    tech_shift_intervals: dict[str, list[tuple[int, int]]] = {}
+    for technician, group in groupby(shift_rows, key=itemgetter(0)):
+        capable_technicians.append(technician)
+        tech_shift_intervals[technician.uid] = [
+            (to_epoch_seconds(start_time), to_epoch_seconds(end_time))
+            for _, start_time, end_time in group
+        ]
 
-    capable_technicians = [tech for tech in qualified_technicians if shift_map.get(tech.uid)]
     if not capable_technicians:
         return []
 
-    tech_bookings_query = select(AppointmentTechnicianLink).where(
-        AppointmentTechnicianLink.technician_id.in_([tech.uid for tech in capable_technicians]),
-        AppointmentTechnicianLink.start_time < day_end,
-        AppointmentTechnicianLink.end_time > day_start
-    )
-    tech_bookings = (await db.execute(tech_bookings_query)).scalars().all()
-    tech_bookings_map = defaultdict(list)
-    for booking in tech_bookings:
-        tech_bookings_map[booking.technician_id].append(booking)
-
-    room_bookings_query = select(AppointmentResourceLink).where(
-        AppointmentResourceLink.resource_id.in_(qualified_resource_ids),
-        AppointmentResourceLink.start_time < day_end,
-        AppointmentResourceLink.end_time > day_start
+    tech_booking_index, room_booking_index = await load_booking_indexes(
+        db,
+        [tech.uid for tech in capable_technicians],
+        qualified_resource_ids,
+        day_start,
+        day_end,
+        holds
     )
-    room_bookings = (await db.execute(room_bookings_query)).scalars().all()
-    room_bookings_map = defaultdict(list)
-    for booking in room_bookings:
-        room_bookings_map[booking.resource_id].append(booking)
-
-    if holds:
-        for hold in holds:
-            start = hold.start_time if isinstance(hold.start_time, datetime) else datetime.fromisoformat(str(hold.start_time))
-            end = hold.end_time if isinstance(hold.end_time, datetime) else datetime.fromisoformat(str(hold.end_time))
-            if start.tzinfo is None:
-                start = start.replace(tzinfo=LOCAL_TIMEZONE)
-            if end.tzinfo is None:
-                end = end.replace(tzinfo=LOCAL_TIMEZONE)
-
-            if hold.technician_uid:
-                tech_bookings_map[hold.technician_uid].append(
-                    SimpleNamespace(
-                        start_time=start,
-                        end_time=end
-                    )
-                )
-            if hold.resource_uid:
-                room_bookings_map[hold.resource_uid].append(
-                    SimpleNamespace(
-                        start_time=start,
-                        end_time=end
-                    )
-                )
-
-    candidate_slots: set[datetime] = set()
-    for technician in capable_technicians:
-        for shift in shift_map.get(technician.uid, []):
-            window_start = max(shift.start_time.astimezone(LOCAL_TIMEZONE), day_start)
-            window_end = min(shift.end_time.astimezone(LOCAL_TIMEZONE), day_end)
-            if window_end <= window_start:
-                continue
-
-            last_start = window_end - total_tech_duration
-            if last_start < window_start:
-                continue
+    resource_indexes = [
+        (resource, room_booking_index.get(resource.uid, _EMPTY_INTERVAL_INDEX))
+        for resource in qualified_resources
+    ]
 
-            current = window_start
-            while current <= last_start:
-                candidate_slots.add(current)
-                current += slot_step_delta
+    slot_runs = build_slot_runs(
+        (
+            interval
+            for technician in capable_technicians
+            for interval in tech_shift_intervals.get(technician.uid, [])
+        ),
+        to_epoch_seconds(day_start),
+        to_epoch_seconds(day_end),
+        tech_duration_s,
+        slot_step_s
+    )
 
+    candidate_slots = merge_sorted_slots(slot_runs)
     if not candidate_slots:
         return []
 
-    available_slot_payloads: list[schedule_schemas.PackageAvailabilitySlot] = []
-
-    for slot_start in sorted(candidate_slots):
-        slot_end_for_tech = slot_start + total_tech_duration
-        slot_end_for_room = slot_start + total_room_duration
+    tech_entries = [
+        (
+            tech_shift_intervals.get(technician.uid, []),
+            tech_booking_index.get(technician.uid, _EMPTY_INTERVAL_INDEX)
+        )
+        for technician in capable_technicians
+    ]
+    matches = match_package_slots(
+        candidate_slots,
+        tech_entries,
+        [room_index for _, room_index in resource_indexes],
+        tech_duration_s,
+        room_duration_s
+    )
 
-        for technician in capable_technicians:
-            on_shift = any(
-                shift.start_time.astimezone(LOCAL_TIMEZONE) <= slot_start and
-                shift.end_time.astimezone(LOCAL_TIMEZONE) >= slot_end_for_tech
-                for shift in shift_map.get(technician.uid, [])
+    # 技师/房间的输出对象按需构建一次，多个时间槽共用
+    tech_payloads: dict[int, schedule_schemas.PackageSlotTechnician] = {}
+    resource_payloads: dict[int, schedule_schemas.PackageSlotResource] = {}
+    available_slot_payloads: list[schedule_schemas.PackageAvailabilitySlot] = []
+    for slot_start_ts, tech_position, resource_position in matches:
+        tech_payload = tech_payloads.get(tech_position)
+        if tech_payload is None:
+            technician = capable_technicians[tech_position]
+            tech_payload = tech_payloads[tech_position] = schedule_schemas.PackageSlotTechnician(
+                uid=technician.uid,
+                nickname=technician.nickname,
+                phone=technician.phone
+            )
+        resource_payload = resource_payloads.get(resource_position)
+        if resource_payload is None:
+            resource = resource_indexes[resource_position][0]
+            resource_payload = resource_payloads[resource_position] = schedule_schemas.PackageSlotResource(
+                uid=resource.uid,
+                name=resource.name
             )
-            if not on_shift:
-                continue
 
-            bookings = tech_bookings_map.get(technician.uid, [])
-            is_booked = any(
-                is_overlap(
-                    booking.start_time,
-                    booking.end_time,
-                    slot_start,
-                    slot_end_for_tech
-                )
-                for booking in bookings
+        available_slot_payloads.append(
+            schedule_schemas.PackageAvailabilitySlot(
+                start_time=datetime.fromtimestamp(slot_start_ts, LOCAL_TIMEZONE),
+                technician=tech_payload,
+                resource=resource_payload
             )
-            if is_booked:
-                continue
+        )
 
-            for resource in qualified_resources:
-                bookings = room_bookings_map.get(resource.uid, [])
-                is_room_booked = any(
-                    is_overlap(
-                        booking.start_time,
-                        booking.end_time,
-                        slot_start,
-                        slot_end_for_room
-                    )
-                    for booking in bookings
-                )
-                if is_room_booked:
-                    continue
-
-                available_slot_payloads.append(
-                    schedule_schemas.PackageAvailabilitySlot(
-                        start_time=slot_start,
-                        technician=schedule_schemas.PackageSlotTechnician(
-                            uid=technician.uid,
-                            nickname=technician.nickname,
-                            phone=technician.phone
-                        ),
-                        resource=schedule_schemas.PackageSlotResource(
-                            uid=resource.uid,
-                            name=resource.name
-                        )
-                    )
-                )
-                break
+    return available_slot_payloads
 
-            if available_slot_payloads and available_slot_payloads[-1].start_time == slot_start:
-                break
+async def _lock_free_candidate(db: AsyncSession, uid_column, candidate_ids: list[str], overlap_query) -> str | None:
+    """
+    按候选顺序逐个加行锁（FOR UPDATE SKIP LOCKED），被其他预约者锁住的候选先跳过；
+    加锁后复核占用，已被占用则换下一个候选。
+    空闲候选全部被跳过时，阻塞等待第一个被跳过的候选再复核：行锁只说明有人在预约同一技师/房间，不代表时间冲突。
+    返回锁定的 uid，确实没有可用候选时返回 None。
+    """
+    skipped_ids: list[str] = []
+    for candidate_id in candidate_ids:
+        locked_id = (await db.execute(
+            select(uid_column).where(uid_column == candidate_id).with_for_update(skip_locked=True)
+        )).scalar()
+        if locked_id is None:
+            skipped_ids.append(candidate_id)
+            continue
+        # 事务为 READ COMMITTED，普通读即可看到其他事务已提交的预约，无需加共享锁
+        if (await db.execute(overlap_query(candidate_id).limit(1))).first() is None:
+            return candidate_id
 
-    return available_slot_payloads
+    if not skipped_ids:
+        return None
+    locked_id = (await db.execute(
+        select(uid_column).where(uid_column == skipped_ids[0]).with_for_update()
+    )).scalar()
+    if locked_id is None or (await db.execute(overlap_query(locked_id).limit(1))).first() is not None:
+        return None
+    return locked_id
 
 async def create_appointment(
     db: AsyncSession, 
@@ -529,6 +931,13 @@ async def create_appointment(
     appt_data: AppointmentCreate
 ) -> Appointment:
     
+    # 预约事务使用 READ COMMITTED：行锁已让同一技师/房间的预约者排队，复核只需读到已提交的数据，
+    # 也避免 REPEATABLE READ 下占用索引上的间隙锁与插入意向锁互相等待造成死锁。
+    # 隔离级别只能在事务开始时设置，先结束此前（如加载当前用户）的只读事务
+    if db.in_transaction():
+        await db.commit()
+    await db.connection(execution_options={"isolation_level": "READ COMMITTED"})
+
     # ----------------------------------------------------
     # 步骤 1 & 2: 获取服务详情并计算总占用
     # (与 get_available_slots 相同的逻辑)
@@ -540,137 +949,156 @@ async def create_appointment(
     if not db_service:
         raise Exception("服务项目不存在")
 
-    slot_step_minutes = get_slot_interval_minutes(db_service)
-    slot_step_delta = timedelta(minutes=slot_step_minutes)
-
-    total_tech_duration = timedelta(minutes=(
-        db_service.technician_operation_duration + db_service.buffer_time
-    ))
-    total_room_duration = timedelta(minutes=(
-        db_service.room_operation_duration + db_service.buffer_time
-    ))
+    timings = get_service_timings(db_service)
+    total_tech_duration = timings.tech_duration
     
     # ----------------------------------------------------
     # 步骤 3: 确定预约的时间范围
     # ----------------------------------------------------
     appt_start = appt_data.start_time
     appt_tech_end = appt_start + total_tech_duration
-    if total_room_duration == timedelta():
-        total_room_duration = slot_step_delta
-    appt_room_end = appt_start + total_room_duration
+    appt_room_end = appt_start + timings.room_duration
 
     # ----------------------------------------------------
-    # 步骤 4.1: 查找空闲的合格技师
+    # 步骤 4: 查找空闲的合格技师与房间（一次查询）
     # ----------------------------------------------------
-    capable_tech_uids = [
-        tech.uid for tech in (await db.execute(
-            select(User).join(User.service).where(Service.uid == appt_data.service_uid)
-        )).scalars().all()
-    ]
-
-    required_tech_end = appt_start + total_tech_duration
-    if total_tech_duration == timedelta():
-        required_tech_end = appt_start
-
-    shift_query = (
-        select(Shift)
-        .options(joinedload(Shift.technician))
+    # a. 能做该服务、排班覆盖预约时间的技师，并标记是否已被预约
+    capable_tech_ids = select(technician_service_link_table.c.user_id).where(
+        technician_service_link_table.c.service_id == appt_data.service_uid
+    )
+    tech_is_booked = exists().where(
+        AppointmentTechnicianLink.technician_id == Shift.technician_id,
+        AppointmentTechnicianLink.start_time < appt_tech_end,
+        AppointmentTechnicianLink.end_time > appt_start,
+        AppointmentTechnicianLink.appointment_id == Appointment.uid,
+        Appointment.status != 'cancelled'
+    ).correlate(Shift)
+    tech_candidates = (
+        select(
+            literal("technician").label("kind"),
+            Shift.technician_id.label("candidate_id"),
+            tech_is_booked.label("is_booked"),
+            Shift.start_time.label("sort_time")
+        )
         .where(
-            Shift.technician_id.in_(capable_tech_uids),
+            Shift.technician_id.in_(capable_tech_ids),
             Shift.location_id == appt_data.location_uid,
             Shift.is_cancelled == False,
             Shift.start_time <= appt_start,
-            Shift.end_time >= required_tech_end
+            Shift.end_time >= appt_tech_end
         )
-        .order_by(Shift.start_time)
     )
-    candidate_shifts = (await db.execute(shift_query)).scalars().all()
-
-    if not candidate_shifts:
-        raise Exception("没有技师在此时间排班或排班时间不足")
 
-    candidate_tech_ids = [shift.technician_id for shift in candidate_shifts]
-
-    booked_techs_query = select(AppointmentTechnicianLink.technician_id).where(
-        AppointmentTechnicianLink.technician_id.in_(candidate_tech_ids),
-        AppointmentTechnicianLink.start_time < (required_tech_end if total_tech_duration > timedelta() else appt_start),
-        AppointmentTechnicianLink.end_time > appt_start
+    # b. 该地点能做该服务的房间，并标记是否已被预约
+    capable_room_ids = select(resource_service_link_table.c.resource_id).where(
+        resource_service_link_table.c.service_id == appt_data.service_uid
+    )
+    room_is_booked = exists().where(
+        AppointmentResourceLink.resource_id == Resource.uid,
+        # 检查时间重叠
+        AppointmentResourceLink.start_time < appt_room_end,
+        AppointmentResourceLink.end_time > appt_start,
+        AppointmentResourceLink.appointment_id == Appointment.uid,
+        Appointment.status != 'cancelled'
+    ).correlate(Resource)
+    room_candidates = (
+        select(
+            literal("resource").label("kind"),
+            Resource.uid.label("candidate_id"),
+            room_is_booked.label("is_booked"),
+            null().label("sort_time")
+        )
+        .where(
+            Resource.location_id == appt_data.location_uid,
+            Resource.uid.in_(capable_room_ids)
+        )
     )
-    booked_tech_ids = set((await db.execute(booked_techs_query)).scalars().all())
 
-    chosen_shift: Shift | None = None
-    for shift in candidate_shifts:
-        if shift.technician_id not in booked_tech_ids:
-            chosen_shift = shift
-            break
+    # 空闲的候选排在前面，每类按顺序保留未被预约的候选
+    candidate_rows = (await db.execute(
+        union_all(tech_candidates, room_candidates).order_by("kind", "is_booked", "sort_time")
+    )).all()
+    if not any(row.kind == "technician" for row in candidate_rows):
+        raise Exception("没有技师在此时间排班或排班时间不足")
+    if not any(row.kind == "resource" for row in candidate_rows):
+        raise Exception("该地点没有可用的房间/床位")
 
-    if not chosen_shift:
-        raise Exception("该时间段的技师已被预约，请选择其他时间")
+    free_tech_ids = list(dict.fromkeys(
+        row.candidate_id for row in candidate_rows if row.kind == "technician" and not row.is_booked
+    ))
+    free_room_ids = [row.candidate_id for row in candidate_rows if row.kind == "resource" and not row.is_booked]
 
-    available_technician = chosen_shift.technician
+    if not free_tech_ids:
+        raise Exception("该时间段的技师已被预约，请选择其他时间")
+    if not free_room_ids:
+        raise Exception("该时间段的房间已被预约，请选择其他时间")
 
     # ----------------------------------------------------
-    # 步骤 4.2: (重构) 查找空闲的合格房间
+    # 步骤 4.5: 在同一事务中锁定空闲的技师与房间
     # ----------------------------------------------------
-    qualified_rooms_query = select(Resource).where(
-        Resource.location_id == appt_data.location_uid,
-        Resource.services.any(Service.uid == appt_data.service_uid)
+    # 按候选顺序加锁，其他预约者正在锁定的候选先跳过，改用下一个空闲候选；都被锁住时才排队等待
+    available_technician_id = await _lock_free_candidate(
+        db,
+        User.uid,
+        free_tech_ids,
+        lambda technician_id: select(AppointmentTechnicianLink.uid).join(
+            Appointment, Appointment.uid == AppointmentTechnicianLink.appointment_id
+        ).where(
+            AppointmentTechnicianLink.technician_id == technician_id,
+            AppointmentTechnicianLink.start_time < appt_tech_end,
+            AppointmentTechnicianLink.end_time > appt_start,
+            Appointment.status != 'cancelled'
+        )
     )
-    qualified_rooms = (await db.execute(qualified_rooms_query)).scalars().all()
-
-    if not qualified_rooms:
-        raise Exception("该地点没有可用的房间/床位")
+    if available_technician_id is None:
+        await db.rollback()
+        raise Exception("该时间段的技师已被预约，请选择其他时间")
 
-    booked_rooms_query = select(AppointmentResourceLink.resource_id).where(
-        AppointmentResourceLink.resource_id.in_([r.uid for r in qualified_rooms]),
-        # 检查时间重叠
-        AppointmentResourceLink.start_time < appt_room_end,
-        AppointmentResourceLink.end_time > appt_start
+    available_room_id = await _lock_free_candidate(
+        db,
+        Resource.uid,
+        free_room_ids,
+        lambda room_id: select(AppointmentResourceLink.uid).join(
+            Appointment, Appointment.uid == AppointmentResourceLink.appointment_id
+        ).where(
+            AppointmentResourceLink.resource_id == room_id,
+            AppointmentResourceLink.start_time < appt_room_end,
+            AppointmentResourceLink.end_time > appt_start,
+            Appointment.status != 'cancelled'
+        )
     )
-    booked_room_ids = (await db.execute(booked_rooms_query)).scalars().all()
-
-    # 找到第一个空闲的房间
-    available_room: Resource | None = None
-    for room in qualified_rooms:
-        if room.uid not in booked_room_ids:
-            available_room = room
-            break # 找到一个！
-
-    if not available_room:
+    if available_room_id is None:
+        await db.rollback()
         raise Exception("该时间段的房间已被预约，请选择其他时间") # 竞态条件失败
 
     # ----------------------------------------------------
     # 步骤 5: 创建所有记录 (事务)
     # ----------------------------------------------------
     try:
-        # 1. 创建 Appointment 主记录
+        # 1. 创建 Appointment 主记录，技师与房间占用记录挂在关系上，
+        #    提交时由工作单元按外键依赖顺序一次写入，无需先 flush 获取 uid
         new_appointment = Appointment(
             customer_id=customer.uid,
             service_id=appt_data.service_uid,
             location_id=appt_data.location_uid,
-            start_time=appt_start
+            start_time=appt_start,
             # status 默认为 'confirmed'
+            # 2. 技师 占用记录
+            technician_link=AppointmentTechnicianLink(
+                technician_id=available_technician_id,
+                start_time=appt_start,
+                end_time=appt_tech_end
+            ),
+            # 3. 房间 占用记录
+            resources_link=[
+                AppointmentResourceLink(
+                    resource_id=available_room_id,
+                    start_time=appt_start,
+                    end_time=appt_room_end
+                )
+            ]
         )
         db.add(new_appointment)
-        await db.flush() # 立即执行以获取 new_appointment.uid
-
-        # 2. 创建 技师 占用记录
-        tech_link = AppointmentTechnicianLink(
-            appointment_id=new_appointment.uid,
-            technician_id=available_technician.uid,
-            start_time=appt_start,
-            end_time=appt_tech_end
-        )
-        db.add(tech_link)
-
-        # 3. 创建 房间 占用记录
-        room_link = AppointmentResourceLink(
-            appointment_id=new_appointment.uid,
-            resource_id=available_room.uid,
-            start_time=appt_start,
-            end_time=appt_room_end
-        )
-        db.add(room_link)
 
         # 4. 提交事务
         await db.commit()
@@ -686,9 +1114,30 @@ async def create_appointment(
 
 # --- 技师排班管理 ---
 
-async def list_schedule_locations(db: AsyncSession) -> list[Location]:
-    result = await db.execute(select(Location).order_by(Location.name))
-    return result.scalars().all()
+def invalidate_locations_cache() -> None:
+    """地点数据发生变更后调用，清空进程内的地点列表缓存。"""
+    global _LOCATIONS_CACHE
+    _LOCATIONS_CACHE = None
+
+
+async def list_schedule_locations(db: AsyncSession) -> list[LocationOption]:
+    """
+    返回排班可用地点 (uid, 名称) 列表。
+    缓存的是与会话无关的快照而非 ORM 对象，跨请求复用不会触发懒加载或过期状态。
+    """
+    global _LOCATIONS_CACHE
+    cached = _LOCATIONS_CACHE
+    if cached and monotonic() - cached[0] < LOCATIONS_CACHE_TTL_SECONDS:
+        return list(cached[1])
+
+    result = await db.execute(select(Location.uid, Location.name).order_by(Location.name))
+    locations = tuple(
+        LocationOption(uid=uid, name=name or '未命名地点')
+        for uid, name in result.all()
+    )
+    _LOCATIONS_CACHE = (monotonic(), locations)
+    # 返回新列表，避免调用方修改缓存内容
+    return list(locations)
 
 
 async def get_location_day_summary(
@@ -715,48 +1164,36 @@ async def get_location_day_summary(
     )
     shifts = shift_rows.scalars().all()
 
-    active_map: dict[date, dict[str, bool]] = {}
+    active_map: dict[date, dict[str, int]] = {}
     for shift in shifts:
         if not shift.start_time or not shift.end_time:
             continue
-        normalized_date = normalize_local_date(shift.start_time)
-        period = shift.period or infer_shift_period(shift.start_time, shift.end_time)
-        period_map = active_map.setdefault(normalized_date, {})
-
-        def append_slot(period_key: str):
-            info = period_map.setdefault(period_key, {
-                'active': True,
-                'slots': set()
-            })
-            info['active'] = True
-            local_start = shift.start_time.astimezone(LOCAL_TIMEZONE)
-            local_end = shift.end_time.astimezone(LOCAL_TIMEZONE)
-            cursor = local_start
-            while cursor < local_end:
-                info['slots'].add(cursor.strftime('%H:%M'))
-                cursor += timedelta(hours=1)
-
-        if period in ('morning', 'afternoon'):
-            append_slot(period)
-        else:
-            append_slot('morning')
-            append_slot('afternoon')
+        # 每个排班只做一次时区转换，时间槽按整数秒换算后写入对应时段
+        local_start = shift.start_time.astimezone(LOCAL_TIMEZONE)
+        local_end = shift.end_time.astimezone(LOCAL_TIMEZONE)
+        period = shift.period or infer_shift_period(local_start, local_end)
+        period_map = active_map.setdefault(local_start.date(), {})
+
+        shift_mask = hourly_slot_mask(to_epoch_seconds(local_start), to_epoch_seconds(local_end))
+
+        period_keys = (period,) if period in ('morning', 'afternoon') else ('morning', 'afternoon')
+        for period_key in period_keys:
+            # 时段内的时间槽以位掩码合并，有记录即代表该时段有排班
+            period_map[period_key] = period_map.get(period_key, 0) | shift_mask
 
     summary: list[schedule_schemas.LocationDay] = []
     for offset in range(days):
         current_date = today + timedelta(days=offset)
         period_map = active_map.get(current_date, {})
-        morning_info = period_map.get('morning', {'active': False, 'slots': set()})
-        afternoon_info = period_map.get('afternoon', {'active': False, 'slots': set()})
         summary.append(
             schedule_schemas.LocationDay(
                 date=current_date,
                 weekday=WEEKDAY_NAMES[current_date.weekday()],
                 has_any_shift=bool(period_map),
-                morning_active=morning_info['active'],
-                afternoon_active=afternoon_info['active'],
-                morning_slots=sorted(morning_info['slots']),
-                afternoon_slots=sorted(afternoon_info['slots'])
+                morning_active='morning' in period_map,
+                afternoon_active='afternoon' in period_map,
+                morning_slots=slot_mask_labels(period_map.get('morning', 0)),
+                afternoon_slots=slot_mask_labels(period_map.get('afternoon', 0))
             )
         )
 
@@ -769,11 +1206,12 @@ async def list_services_for_location(
 ) -> list[Service]:
     service_query = (
         select(Service)
-        .options(joinedload(Service.resources), joinedload(Service.technicians))
+        # 技师集合用 selectinload 单独按 IN 批量加载，避免 JOIN 把每个服务按技师数重复返回
+        .options(selectinload(Service.technicians))
         .where(Service.resources.any(Resource.location_id == location_uid))
         .order_by(Service.name)
     )
-    services = (await db.execute(service_query)).scalars().unique().all()
+    services = (await db.execute(service_query)).scalars().all()
     return services
 
 
@@ -785,8 +1223,8 @@ async def list_service_options_for_location(
 
     services = await list_services_for_location(db, location_uid)
     options: list[schedule_schemas.ServiceOption] = []
+    # 查询条件已保证每个服务在该地点都有资源，只需判断是否有技师
     for service in services:
-        has_resource = any(res.location_id == location_uid for res in service.resources)
         has_technician = bool(service.technicians)
         options.append(
             schedule_schemas.ServiceOption(
@@ -795,7 +1233,7 @@ async def list_service_options_for_location(
                 technician_duration=max(service.technician_operation_duration or 0, 0),
                 room_duration=max(service.room_operation_duration or 0, 0),
                 buffer_time=max(service.buffer_time or 0, 0),
-                is_active=has_resource and has_technician
+                is_active=has_technician
             )
         )
     return options
@@ -810,30 +1248,43 @@ async def list_technicians_for_location_services(
 
     requested_service_set = {uid for uid in service_uids if uid}
 
+    # 近期排班与技能匹配数都由数据库按技师逐行算出，一次查询取回
+    now_dt = datetime.now(LOCAL_TIMEZONE)
+    has_upcoming_shift = exists().where(
+        Shift.technician_id == User.uid,
+        Shift.location_id == location_uid,
+        Shift.is_cancelled == False,
+        Shift.end_time > now_dt
+    ).correlate(User)
+    if requested_service_set:
+        matched_service_count = (
+            select(func.count())
+            .select_from(technician_service_link_table)
+            .where(
+                technician_service_link_table.c.user_id == User.uid,
+                technician_service_link_table.c.service_id.in_(requested_service_set)
+            )
+            .correlate(User)
+            .scalar_subquery()
+        )
+    else:
+        matched_service_count = literal(0)
+
     tech_query = (
-        select(User)
-        .options(joinedload(User.service))
+        select(
+            User,
+            has_upcoming_shift.label("has_upcoming_shift"),
+            matched_service_count.label("matched_service_count")
+        )
         .where(User.role.in_(("technician", "admin")))
         .order_by(User.nickname)
     )
-    technicians = (await db.execute(tech_query)).scalars().unique().all()
-
-    now_dt = datetime.now(LOCAL_TIMEZONE)
-    shift_rows = await db.execute(
-        select(Shift.technician_id)
-        .where(
-            Shift.location_id == location_uid,
-            Shift.is_cancelled == False,
-            Shift.end_time > now_dt
-        )
-    )
-    technicians_with_shifts = {row[0] for row in shift_rows}
+    tech_rows = (await db.execute(tech_query)).all()
 
     options: list[schedule_schemas.TechnicianOption] = []
-    for technician in technicians:
-        service_set = {service.uid for service in technician.service}
-        has_all_services = requested_service_set.issubset(service_set) if requested_service_set else True
-        available_for_location = technician.uid in technicians_with_shifts
+    for technician, has_shift, matched_count in tech_rows:
+        has_all_services = matched_count == len(requested_service_set) if requested_service_set else True
+        available_for_location = bool(has_shift)
 
         is_available = has_all_services and available_for_location
         disabled_reason = None
@@ -861,7 +1312,7 @@ async def create_shifts_for_technician(
     items: list,
     created_by_user: User | None = None,
     lock_created_by_admin: bool = False,
-) -> list[Shift]:
+) -> list[str]:
     from . import schemas as schedule_schemas
 
     if not items:
@@ -883,8 +1334,11 @@ async def create_shifts_for_technician(
         return []
 
     location_uids = {payload.location_uid for payload in normalized_items}
-    location_map = {loc.uid: loc for loc in await list_schedule_locations(db)}
-    if not location_uids.issubset(location_map.keys()):
+    # 写路径直接查库校验，不使用地点缓存，避免刚删除/新建的地点误判
+    known_location_uids = set((await db.execute(
+        select(Location.uid).where(Location.uid.in_(location_uids))
+    )).scalars().all())
+    if not location_uids.issubset(known_location_uids):
         raise ValueError("存在无效的地点，无法创建排班")
 
     window_start = min(payload.date for payload in normalized_items)
@@ -903,58 +1357,62 @@ async def create_shifts_for_technician(
     )
     existing_shifts = (await db.execute(existing_shifts_query)).scalars().all()
 
-    existing_index: dict[tuple[date, str], Shift] = {}
+    # 班次时段互不重叠：同一 (日期, 时段) 必然冲突，不同 (日期, 时段) 必然不冲突，
+    # 因此按网格建索引即可完成冲突检测；只有无法归入网格的历史排班才需要逐个比较。
+    occupied_keys: set[tuple[date, str]] = set()
+    off_grid_intervals: list[tuple[int, int]] = []
     for shift in existing_shifts:
         period = shift.period or infer_shift_period(shift.start_time, shift.end_time)
         if not period:
+            off_grid_intervals.append((to_epoch_seconds(shift.start_time), to_epoch_seconds(shift.end_time)))
             continue
-        existing_index[(normalize_local_date(shift.start_time), period)] = shift
+        occupied_keys.add((normalize_local_date(shift.start_time), period))
+    # 时区归一与整数化只做一次，逐个候选班次时只剩二分查找
+    off_grid_index = build_interval_index(off_grid_intervals)
 
-    created_shifts: list[Shift] = []
+    created_by_user_id = created_by_user.uid if created_by_user else technician.uid
+    shift_rows: list[dict] = []
     for payload in normalized_items:
         period_key = payload.period.value
         key = (payload.date, period_key)
-        if key in existing_index:
+        if key in occupied_keys:
             continue
 
         start_time, end_time = compute_period_window(payload.date, period_key)
 
-        conflict = False
-        for shift in existing_shifts:
-            if is_overlap(shift.start_time, shift.end_time, start_time, end_time):
-                conflict = True
-                break
-        if conflict:
+        if has_overlap(off_grid_index, to_epoch_seconds(start_time), to_epoch_seconds(end_time)):
             continue
 
-        new_shift = Shift(
-            technician_id=technician.uid,
-            location_id=payload.location_uid,
-            start_time=start_time,
-            end_time=end_time,
-            period=period_key,
-            created_by_user_id=(created_by_user.uid if created_by_user else technician.uid),
-            locked_by_admin=lock_created_by_admin,
-            is_cancelled=False,
-        )
-        db.add(new_shift)
-        created_shifts.append(new_shift)
-
-    if not created_shifts:
+        shift_rows.append({
+            "uid": str(ulid.new()),
+            "technician_id": technician.uid,
+            "location_id": payload.location_uid,
+            "start_time": start_time,
+            "end_time": end_time,
+            "period": period_key,
+            "created_by_user_id": created_by_user_id,
+            "locked_by_admin": lock_created_by_admin,
+            "is_cancelled": False,
+        })
+        # 同一批次内重复提交的 (日期, 时段) 只创建一次
+        occupied_keys.add(key)
+
+    if not shift_rows:
         await db.rollback()
         return []
 
+    # 不经过 ORM 工作单元，直接以一条多行 INSERT 写入；uid 预先生成，便于随后取回
+    await db.execute(insert(Shift), shift_rows)
     await db.commit()
-    for shift in created_shifts:
-        await db.refresh(shift, ["location"])
-    return created_shifts
+
+    # 调用方随后重新查询排班日历，这里只返回新排班的 uid，不再回读实体
+    return [row["uid"] for row in shift_rows]
 
 
 async def get_technician_shift_calendar(
     db: AsyncSession,
     technician: User,
     days: int = DEFAULT_CALENDAR_DAYS,
-    include_cancelled: bool = False,
 ):
     from . import schemas as schedule_schemas
 
@@ -964,74 +1422,53 @@ async def get_technician_shift_calendar(
     range_start_dt = datetime.combine(today, time.min, tzinfo=LOCAL_TIMEZONE)
     range_end_dt = datetime.combine(end_date, time.max, tzinfo=LOCAL_TIMEZONE)
 
+    # 每个班次是否已有预约由数据库按索引判断，无需取回预约明细
+    shift_has_bookings = exists().where(
+        AppointmentTechnicianLink.technician_id == Shift.technician_id,
+        AppointmentTechnicianLink.start_time < Shift.end_time,
+        AppointmentTechnicianLink.end_time > Shift.start_time,
+        AppointmentTechnicianLink.appointment_id == Appointment.uid,
+        Appointment.status != 'cancelled'
+    ).correlate(Shift)
     shift_query = (
-        select(Shift)
+        select(Shift, shift_has_bookings.label("has_bookings"))
         .options(joinedload(Shift.location))
         .where(
             Shift.technician_id == technician.uid,
+            # 日历时段只展示有效排班，已取消的排班不占用时段，始终在数据库过滤
+            Shift.is_cancelled == False,
             Shift.start_time < range_end_dt,
             Shift.end_time > range_start_dt,
         )
     )
-    if not include_cancelled:
-        shift_query = shift_query.where(Shift.is_cancelled == False)
 
-    shifts = (await db.execute(shift_query)).scalars().all()
-
-    booking_intervals: list[tuple[datetime, datetime]] = []
-    if shifts:
-        bookings_query = (
-            select(
-                AppointmentTechnicianLink.start_time,
-                AppointmentTechnicianLink.end_time
-            )
-            .join(Appointment, Appointment.uid == AppointmentTechnicianLink.appointment_id)
-            .where(
-                AppointmentTechnicianLink.technician_id == technician.uid,
-                AppointmentTechnicianLink.start_time < range_end_dt,
-                AppointmentTechnicianLink.end_time > range_start_dt,
-                Appointment.status != 'cancelled'
-            )
-        )
-        booking_rows = (await db.execute(bookings_query)).all()
-        booking_intervals = [
-            (
-                row[0].astimezone(LOCAL_TIMEZONE) if row[0].tzinfo else row[0].replace(tzinfo=LOCAL_TIMEZONE),
-                row[1].astimezone(LOCAL_TIMEZONE) if row[1].tzinfo else row[1].replace(tzinfo=LOCAL_TIMEZONE)
-            )
-            for row in booking_rows
-        ]
-
-    shift_map: dict[tuple[date, str], Shift] = {}
-    for shift in shifts:
-        if shift.is_cancelled:
-            continue
-        period = shift.period or infer_shift_period(shift.start_time, shift.end_time)
-        if not period:
-            continue
-        shift_map[(normalize_local_date(shift.start_time), period)] = shift
+    shift_rows = (await db.execute(shift_query)).all()
+
+    period_window_index = build_period_window_index(today, days)
+    shift_map: dict[tuple[date, str], tuple[Shift, bool]] = {}
+    for shift, has_bookings in shift_rows:
+        local_start = ensure_timezone(shift.start_time)
+        local_end = ensure_timezone(shift.end_time)
+        slot_key = period_window_index.get((local_start, local_end))
+        if slot_key is None:
+            period = shift.period or infer_shift_period(local_start, local_end)
+            if not period:
+                continue
+            slot_key = (normalize_local_date(local_start), period)
+        elif shift.period:
+            slot_key = (slot_key[0], shift.period)
+        shift_map[slot_key] = (shift, bool(has_bookings))
 
-    weekday_names = ['周一', '周二', '周三', '周四', '周五', '周六', '周日']
     days_payload: list[schedule_schemas.TechnicianShiftDay] = []
     for offset in range(days):
         current_date = today + timedelta(days=offset)
-        weekday = weekday_names[current_date.weekday()]
+        weekday = WEEKDAY_NAMES[current_date.weekday()]
 
         slots = {}
         for period_key in ['morning', 'afternoon']:
-            shift = shift_map.get((current_date, period_key))
-            if shift:
-                local_start = shift.start_time if shift.start_time.tzinfo else shift.start_time.replace(tzinfo=LOCAL_TIMEZONE)
-                local_end = shift.end_time if shift.end_time.tzinfo else shift.end_time.replace(tzinfo=LOCAL_TIMEZONE)
-                has_bookings = any(
-                    is_overlap(
-                        start,
-                        end,
-                        local_start,
-                        local_end
-                    )
-                    for start, end in booking_intervals
-                )
+            shift_entry = shift_map.get((current_date, period_key))
+            if shift_entry:
+                shift, has_bookings = shift_entry
                 slots[period_key] = schedule_schemas.TechnicianShiftSlot(
                     is_active=True,
                     shift_uid=shift.uid,
@@ -1056,10 +1493,7 @@ async def get_technician_shift_calendar(
             )
         )
 
-    location_options = [
-        schedule_schemas.LocationOption(uid=loc.uid, name=loc.name or '未命名地点')
-        for loc in await list_schedule_locations(db)
-    ]
+    location_options = await list_schedule_locations(db)
 
     return schedule_schemas.TechnicianShiftCalendar(
         generated_at=datetime.now(LOCAL_TIMEZONE),
@@ -1085,19 +1519,18 @@ async def cancel_shift_by_admin(
     if shift.is_cancelled:
         return shift
 
-    # 检查是否存在未来预约
-    conflict_query = (
-        select(Appointment)
-        .join(AppointmentTechnicianLink)
-        .where(
+    # 检查是否存在未来预约 (只需判断存在性，不加载 Appointment 实体)
+    conflict_query = select(
+        exists().where(
+            AppointmentTechnicianLink.appointment_id == Appointment.uid,
             AppointmentTechnicianLink.technician_id == shift.technician_id,
             AppointmentTechnicianLink.start_time < shift.end_time,
             AppointmentTechnicianLink.end_time > shift.start_time,
             Appointment.status != 'cancelled'
         )
     )
-    conflict = (await db.execute(conflict_query)).scalars().first()
-    if conflict:
+    has_conflict = (await db.execute(conflict_query)).scalar()
+    if has_conflict:
         raise ValueError("该排班已有预约，请先处理相关预约后再取消")
 
     shift.is_cancelled = True
@@ -2,7 +2,7 @@
 
 from __future__ import annotations
 import datetime
-from sqlalchemy import Column, String, ForeignKey, DateTime, func, Boolean
+from sqlalchemy import Column, String, ForeignKey, DateTime, Index, func, Boolean
 from sqlalchemy.orm import relationship, Mapped, mapped_column
 from src.core.database import Base
 import ulid
@@ -17,10 +17,13 @@ class Shift(Base):
     uid: Mapped[str] = mapped_column(String(26), primary_key=True, default=lambda: str(ulid.new()), index=True)
     
     # 关联到 User (技师)
-    technician_id: Mapped[str] = mapped_column(String(26), ForeignKey("users.uid"), index=True)
+    technician_id: Mapped[str] = mapped_column(
+        String(26),
+        ForeignKey("users.uid", name="fk_shifts_technician_user", ondelete="CASCADE")
+    )
     
     # 关联到 Location (地点)
-    location_id: Mapped[str] = mapped_column(String(26), ForeignKey("locations.uid"), index=True)
+    location_id: Mapped[str] = mapped_column(String(26), ForeignKey("locations.uid"))
 
     start_time: Mapped[datetime.datetime] = mapped_column(DateTime(timezone=True), nullable=False, comment="排班开始时间")
     end_time: Mapped[datetime.datetime] = mapped_column(DateTime(timezone=True), nullable=False, comment="排班结束时间")
@@ -73,15 +76,14 @@ class Shift(Base):
         back_populates="shifts",
         foreign_keys=[technician_id]
     )
+    # 创建人/取消人只在需要时由调用方显式预加载，避免每次查询排班都两次外连接 users
     created_by: Mapped["User"] = relationship(
         "User",
-        foreign_keys=[created_by_user_id],
-        lazy="joined"
+        foreign_keys=[created_by_user_id]
     )
     cancelled_by: Mapped["User"] = relationship(
         "User",
-        foreign_keys=[cancelled_by_user_id],
-        lazy="joined"
+        foreign_keys=[cancelled_by_user_id]
     )
     
     # 关联到地点 (Location)
@@ -89,3 +91,11 @@ class Shift(Base):
         "Location", 
         back_populates="shifts"
     )
+
+    # technician_id / location_id 不再单独建索引，由下面以其为最左列的复合索引覆盖
+    __table_args__ = (
+        # 排班可用性查询: technician_id IN (...) AND location_id = ? AND is_cancelled = 0 AND start_time < ?
+        Index("ix_shifts_tech_location_active_start", "technician_id", "location_id", "is_cancelled", "start_time"),
+        # 地点日历: location_id = ? AND is_cancelled = 0 AND start_time < ?
+        Index("ix_shifts_location_active_start", "location_id", "is_cancelled", "start_time"),
+    )
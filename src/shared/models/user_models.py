@@ -34,7 +34,11 @@ class SocialAccount(Base):
     __tablename__ = "social_accounts"
 
     uid: Mapped[str] = mapped_column(String(26), primary_key=True, default=lambda: str(ulid.new()), index=True)
-    user_id: Mapped[str] = mapped_column(String(26), ForeignKey("users.uid"), index=True)
+    user_id: Mapped[str] = mapped_column(
+        String(26),
+        ForeignKey("users.uid", name="fk_social_accounts_user", ondelete="CASCADE"),
+        index=True
+    )
     provider: Mapped[str] = mapped_column(String(50), index=True, comment="e.g., wechat, xiaohongshu")
     provider_id: Mapped[str] = mapped_column(String(128), index=True, comment="OpenID, XHS OpenID, etc.")
     
@@ -55,16 +59,24 @@ class User(Base):
     nickname: Mapped[str] = mapped_column(String(50), nullable=False, default="微信用户")
     avatar_url: Mapped[str] = mapped_column(String(255),nullable=True)
     phone: Mapped[str] = mapped_column(String(15), unique=True, nullable=True)
-    role: Mapped[str] = Column(Enum("customer", "technician", "admin", name="user_role_enum"), default="customer")
+    # 技师列表等查询按 role 过滤，技师/管理员在用户中占比很小，索引选择性高
+    role: Mapped[str] = mapped_column(
+        Enum("customer", "technician", "admin", name="user_role_enum"),
+        nullable=True,
+        default="customer",
+        index=True
+    )
     level: Mapped[int] = mapped_column(Integer, default=1)
 
     password_hash: Mapped[str] = mapped_column(String(255), nullable=True)
     
     # 关联的第三方社交账号
+    # 删除用户时由数据库 ON DELETE CASCADE 清理，无需先把关联行全部加载到内存
     social_accounts: Mapped[list["SocialAccount"]] = relationship(
         "SocialAccount", 
         back_populates="user", 
-        cascade="all, delete-orphan"
+        cascade="all, delete-orphan",
+        passive_deletes=True
     )
     
     # 技师与服务的 多对多 关系
@@ -84,7 +96,8 @@ class User(Base):
         "Shift",
         back_populates="technician",
         cascade="all, delete-orphan",
-        foreign_keys="Shift.technician_id"
+        foreign_keys="Shift.technician_id",
+        passive_deletes=True
     )
     
     created_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True), server_default=func.now())
@@ -0,0 +1,198 @@
+"""单服务可预约时间槽（位掩码路径）的测试，数据库查询结果由假会话按调用顺序返回。"""
+import asyncio
+import random
+from datetime import date, datetime, time, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+from src.modules.schedule.service import LOCAL_TIMEZONE, get_available_slots, is_overlap
+
+TARGET_DATE = date(2026, 3, 2)
+
+
+class _FakeResult:
+    def __init__(self, rows):
+        self._rows = rows
+
+    def scalars(self):
+        return self
+
+    def first(self):
+        return self._rows[0] if self._rows else None
+
+    def all(self):
+        return list(self._rows)
+
+
+class _FakeSession:
+    """按顺序返回预设的查询结果，并记录查询次数。"""
+
+    def __init__(self, *results):
+        self._results = list(results)
+        self.calls = 0
+
+    async def execute(self, statement):
+        self.calls += 1
+        return _FakeResult(self._results.pop(0))
+
+
+def _service(tech_minutes=60, room_minutes=60, buffer_minutes=0):
+    return SimpleNamespace(
+        technician_operation_duration=tech_minutes,
+        room_operation_duration=room_minutes,
+        buffer_time=buffer_minutes,
+    )
+
+
+def _at(hour: int, minute: int = 0) -> datetime:
+    return datetime.combine(TARGET_DATE, time(hour, minute), tzinfo=LOCAL_TIMEZONE)
+
+
+def _shift(tech_uid, start, end):
+    return ("technician", tech_uid, start, end)
+
+
+def _room(room_uid):
+    return ("resource", room_uid, None, None)
+
+
+def _run(session, holds=None):
+    return asyncio.run(get_available_slots(session, "loc", "svc", TARGET_DATE, holds))
+
+
+def test_missing_service_raises():
+    session = _FakeSession([])
+    with pytest.raises(Exception, match="服务项目不存在"):
+        _run(session)
+    assert session.calls == 1
+
+
+def test_returns_empty_without_technicians_on_shift():
+    session = _FakeSession([_service()], [_room("R1")])
+    assert _run(session) == []
+    # 没有技师时不再查询预约
+    assert session.calls == 2
+
+
+def test_returns_empty_without_rooms():
+    session = _FakeSession([_service()], [_shift("T1", _at(10), _at(14))])
+    assert _run(session) == []
+    assert session.calls == 2
+
+
+def test_returns_empty_when_no_shift_fits_the_service():
+    session = _FakeSession(
+        [_service(tech_minutes=90)],
+        [_room("R1"), _shift("T1", _at(10), _at(11))],
+        []
+    )
+    assert _run(session) == []
+
+
+def test_marks_slots_free_only_when_technician_and_room_are_free():
+    session = _FakeSession(
+        [_service()],
+        [_room("R1"), _shift("T1", _at(10), _at(14)), _shift("T2", _at(12), _at(13))],
+        [
+            ("resource", "R1", _at(11), _at(12)),
+            ("technician", "T1", _at(12), _at(13)),
+        ]
+    )
+    # 11:00 房间被占；12:00 T1 有预约但 T2 在班且空闲
+    assert _run(session) == ["10:00", "12:00", "13:00"]
+
+
+def test_room_without_bookings_frees_every_slot():
+    session = _FakeSession(
+        [_service()],
+        [_room("R1"), _room("R2"), _shift("T1", _at(9), _at(12))],
+        [("resource", "R1", _at(9), _at(12))]
+    )
+    assert _run(session) == ["09:00", "10:00", "11:00"]
+
+
+def test_back_to_back_bookings_leave_adjacent_slots_free():
+    session = _FakeSession(
+        [_service()],
+        [_room("R1"), _shift("T1", _at(9), _at(13))],
+        [("technician", "T1", _at(10), _at(11)), ("technician", "T1", _at(11), _at(12))]
+    )
+    assert _run(session) == ["09:00", "12:00"]
+
+
+def test_holds_are_treated_as_bookings():
+    hold = SimpleNamespace(
+        technician_uid="T1",
+        resource_uid=None,
+        start_time=_at(10).isoformat(),
+        end_time=_at(11).isoformat(),
+    )
+    session = _FakeSession(
+        [_service()],
+        [_room("R1"), _shift("T1", _at(9), _at(12))],
+        []
+    )
+    assert _run(session, holds=[hold]) == ["09:00", "11:00"]
+
+
+def _baseline_slots(service, shifts, rooms, tech_bookings, room_bookings):
+    """逐个时间槽检查是否存在在班且空闲的技师与空闲房间。"""
+    step = timedelta(minutes=service.technician_operation_duration)
+    tech_span = timedelta(minutes=service.technician_operation_duration + service.buffer_time)
+    room_span = timedelta(minutes=service.room_operation_duration + service.buffer_time)
+    day_start = datetime.combine(TARGET_DATE, time.min, tzinfo=LOCAL_TIMEZONE)
+    day_end = datetime.combine(TARGET_DATE, time.max, tzinfo=LOCAL_TIMEZONE)
+
+    candidates = set()
+    for _, start, end in shifts:
+        current = max(start, day_start)
+        while current + tech_span <= min(end, day_end):
+            candidates.add(current)
+            current += step
+
+    available = []
+    for slot in sorted(candidates):
+        tech_free = any(
+            start <= slot and slot + tech_span <= end
+            and not any(is_overlap(slot, slot + tech_span, b_start, b_end) for b_start, b_end in tech_bookings.get(tech, []))
+            for tech, start, end in shifts
+        )
+        room_free = any(
+            not any(is_overlap(slot, slot + room_span, b_start, b_end) for b_start, b_end in room_bookings.get(room, []))
+            for room in rooms
+        )
+        if tech_free and room_free:
+            available.append(slot.strftime("%H:%M"))
+    return available
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_matches_per_slot_baseline(seed):
+    rng = random.Random(seed)
+    service = _service(
+        tech_minutes=rng.choice([30, 45, 60]),
+        room_minutes=rng.choice([30, 60, 90]),
+        buffer_minutes=rng.choice([0, 15])
+    )
+    techs = [f"T{position}" for position in range(rng.randrange(1, 4))]
+    rooms = [f"R{position}" for position in range(rng.randrange(1, 3))]
+
+    def random_span(min_minutes, max_minutes):
+        start = _at(8) + timedelta(minutes=rng.randrange(0, 10 * 60, 15))
+        return start, start + timedelta(minutes=rng.randrange(min_minutes, max_minutes, 15))
+
+    shifts = sorted((tech, *random_span(60, 300)) for tech in techs for _ in range(rng.randrange(1, 3)))
+    tech_bookings = {tech: sorted(random_span(15, 120) for _ in range(rng.randrange(0, 3))) for tech in techs}
+    room_bookings = {room: sorted(random_span(15, 120) for _ in range(rng.randrange(0, 3))) for room in rooms}
+
+    booking_rows = sorted(
+        [("resource", room, start, end) for room, spans in room_bookings.items() for start, end in spans]
+        + [("technician", tech, start, end) for tech, spans in tech_bookings.items() for start, end in spans]
+    )
+    session = _FakeSession(
+        [service],
+        [_room(room) for room in rooms] + [_shift(tech, start, end) for tech, start, end in shifts],
+        booking_rows
+    )
+    assert _run(session) == _baseline_slots(service, shifts, rooms, tech_bookings, room_bookings)
@@ -0,0 +1,189 @@
+"""创建预约时候选技师/房间的加锁顺序、跳过与回退等待的测试。"""
+import asyncio
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy.dialects import mysql
+
+from src.modules.schedule import service as schedule_service
+from src.modules.schedule.router import create_new_appointment
+from src.modules.schedule.schemas import AppointmentCreate
+
+APPOINTMENT = AppointmentCreate(
+    service_uid="svc",
+    location_uid="loc",
+    start_time=datetime(2026, 3, 2, 10, 0, tzinfo=timezone(timedelta(hours=8))),
+)
+CUSTOMER = SimpleNamespace(uid="C1")
+
+
+class _FakeResult:
+    def __init__(self, rows):
+        self._rows = rows
+
+    def scalars(self):
+        return self
+
+    def first(self):
+        return self._rows[0] if self._rows else None
+
+    def scalar(self):
+        return self._rows[0] if self._rows else None
+
+    def all(self):
+        return list(self._rows)
+
+
+class _BookingSession:
+    """
+    前两次查询依次返回服务与候选行；之后按语句判断：
+    加锁语句记录 (uid, 是否 SKIP LOCKED)，被其他预约者锁住的候选在 SKIP LOCKED 下查不到；
+    复核语句对 booked_ids 中的技师/房间返回一条占用。
+    """
+
+    def __init__(self, candidate_rows, locked_by_others=(), booked_ids=()):
+        service = SimpleNamespace(technician_operation_duration=60, room_operation_duration=60, buffer_time=0)
+        self._queued = [[service], candidate_rows]
+        self.locked_by_others = set(locked_by_others)
+        self.booked_ids = set(booked_ids)
+        self.lock_attempts: list[tuple[str, bool]] = []
+        self.isolation_level = None
+        self.added = []
+        self.commits = 0
+        self.rollbacks = 0
+
+    def in_transaction(self):
+        return True
+
+    async def connection(self, execution_options=None):
+        self.isolation_level = (execution_options or {}).get("isolation_level")
+
+    async def commit(self):
+        self.commits += 1
+
+    async def rollback(self):
+        self.rollbacks += 1
+
+    def add(self, instance):
+        self.added.append(instance)
+
+    async def execute(self, statement):
+        if self._queued:
+            return _FakeResult(self._queued.pop(0))
+
+        compiled = statement.compile(dialect=mysql.dialect())
+        uids = {value for value in compiled.params.values() if isinstance(value, str)} - {"cancelled"}
+        sql = str(compiled)
+        if "FOR UPDATE" in sql:
+            (uid,) = uids
+            skip_locked = "SKIP LOCKED" in sql
+            self.lock_attempts.append((uid, skip_locked))
+            return _FakeResult([] if skip_locked and uid in self.locked_by_others else [uid])
+        return _FakeResult([("link",)] if uids & self.booked_ids else [])
+
+
+def _technician(uid, is_booked=False):
+    return SimpleNamespace(kind="technician", candidate_id=uid, is_booked=is_booked)
+
+
+def _room(uid, is_booked=False):
+    return SimpleNamespace(kind="resource", candidate_id=uid, is_booked=is_booked)
+
+
+def _book(session):
+    return asyncio.run(schedule_service.create_appointment(session, CUSTOMER, APPOINTMENT))
+
+
+def _book_via_router(session):
+    return asyncio.run(create_new_appointment(APPOINTMENT, db=session, current_user=CUSTOMER))
+
+
+def test_locks_candidates_in_query_order():
+    # 数据库已按 (is_booked, 排班开始时间) 排序，T2 排在 T1 之前
+    session = _BookingSession([_room("R2"), _room("R1"), _technician("T2"), _technician("T1")])
+    appointment = _book(session)
+
+    assert session.lock_attempts == [("T2", True), ("R2", True)]
+    assert appointment.technician_link.technician_id == "T2"
+    assert appointment.resources_link[0].resource_id == "R2"
+    assert session.isolation_level == "READ COMMITTED"
+    assert session.added == [appointment]
+
+
+def test_booked_candidates_are_never_locked():
+    session = _BookingSession([_room("R1"), _technician("T1"), _technician("T2", is_booked=True)])
+    _book(session)
+    assert ("T2", True) not in session.lock_attempts
+
+
+def test_skips_candidate_locked_by_another_booker():
+    session = _BookingSession(
+        [_room("R1"), _technician("T2"), _technician("T1")],
+        locked_by_others={"T2"}
+    )
+    appointment = _book(session)
+
+    assert session.lock_attempts[:2] == [("T2", True), ("T1", True)]
+    assert appointment.technician_link.technician_id == "T1"
+
+
+def test_recheck_conflict_moves_to_next_candidate():
+    session = _BookingSession(
+        [_room("R1"), _technician("T2"), _technician("T1")],
+        booked_ids={"T2"}
+    )
+    appointment = _book(session)
+    assert appointment.technician_link.technician_id == "T1"
+
+
+def test_waits_for_lock_when_every_candidate_was_skipped():
+    # 其他预约者锁住 T1 只是在预约别的时间，等锁后复核无冲突即可预约
+    session = _BookingSession([_room("R1"), _technician("T1")], locked_by_others={"T1"})
+    appointment = _book(session)
+
+    assert session.lock_attempts[:2] == [("T1", True), ("T1", False)]
+    assert appointment.technician_link.technician_id == "T1"
+
+
+def test_waits_for_room_lock_when_every_room_was_skipped():
+    session = _BookingSession([_room("R1"), _technician("T1")], locked_by_others={"R1"})
+    appointment = _book(session)
+
+    assert session.lock_attempts == [("T1", True), ("R1", True), ("R1", False)]
+    assert appointment.resources_link[0].resource_id == "R1"
+
+
+def test_conflict_after_waiting_for_technician_lock_returns_409():
+    session = _BookingSession(
+        [_room("R1"), _technician("T1")],
+        locked_by_others={"T1"},
+        booked_ids={"T1"}
+    )
+    with pytest.raises(HTTPException) as exc_info:
+        _book_via_router(session)
+
+    assert exc_info.value.status_code == 409
+    assert exc_info.value.detail == "该时间段的技师已被预约，请选择其他时间"
+    assert session.rollbacks == 1
+    assert session.added == []
+
+
+def test_room_conflict_on_recheck_returns_409():
+    session = _BookingSession([_room("R1"), _technician("T1")], booked_ids={"R1"})
+    with pytest.raises(HTTPException) as exc_info:
+        _book_via_router(session)
+
+    assert exc_info.value.status_code == 409
+    assert exc_info.value.detail == "该时间段的房间已被预约，请选择其他时间"
+    assert session.rollbacks == 1
+
+
+def test_no_free_candidate_in_snapshot_returns_409_without_locking():
+    session = _BookingSession([_room("R1"), _technician("T1", is_booked=True)])
+    with pytest.raises(HTTPException) as exc_info:
+        _book_via_router(session)
+
+    assert exc_info.value.detail == "该时间段的技师已被预约，请选择其他时间"
+    assert session.lock_attempts == []
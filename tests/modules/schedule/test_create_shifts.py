@@ -0,0 +1,154 @@
+"""批量创建排班时的冲突检测（网格时段、非网格历史排班、已取消排班、批次内重复）测试。"""
+import asyncio
+import re
+from datetime import datetime, time, timedelta
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy.dialects import mysql
+
+from src.modules.schedule.service import LOCAL_TIMEZONE, compute_period_window, create_shifts_for_technician
+
+TECHNICIAN = SimpleNamespace(uid="T1")
+PLAN_DATE = datetime.now(LOCAL_TIMEZONE).date() + timedelta(days=1)
+
+
+class _FakeResult:
+    def __init__(self, rows):
+        self._rows = rows
+
+    def scalars(self):
+        return self
+
+    def all(self):
+        return list(self._rows)
+
+
+class _ShiftSession:
+    """
+    依次应答地点校验与已有排班查询，记录批量 INSERT 的行。
+    已有排班查询带有 is_cancelled 过滤条件时才排除已取消的排班，与数据库行为一致。
+    """
+
+    def __init__(self, existing_shifts=(), location_uids=("L1",)):
+        self.existing_shifts = list(existing_shifts)
+        self.location_uids = list(location_uids)
+        self.inserted_rows: list[dict] = []
+        self.calls = 0
+        self.commits = 0
+        self.rollbacks = 0
+
+    async def execute(self, statement, params=None):
+        self.calls += 1
+        if params is not None:
+            self.inserted_rows.extend(params)
+            return _FakeResult([])
+        if self.calls == 1:
+            return _FakeResult(self.location_uids)
+
+        sql = str(statement.compile(dialect=mysql.dialect()))
+        filters_cancelled = re.search(r"shifts\.is_cancelled = (false|0|%s)", sql) is not None
+        return _FakeResult([
+            shift for shift in self.existing_shifts
+            if not (filters_cancelled and shift.is_cancelled)
+        ])
+
+    async def commit(self):
+        self.commits += 1
+
+    async def rollback(self):
+        self.rollbacks += 1
+
+
+def _existing(start, end, period=None, is_cancelled=False):
+    return SimpleNamespace(start_time=start, end_time=end, period=period, is_cancelled=is_cancelled)
+
+
+def _item(period, plan_date=PLAN_DATE, location_uid="L1"):
+    return {"date": plan_date, "period": period, "location_uid": location_uid}
+
+
+def _create(session, items):
+    return asyncio.run(create_shifts_for_technician(session, TECHNICIAN, items))
+
+
+def _created_periods(session):
+    return [(row["start_time"].date(), row["period"]) for row in session.inserted_rows]
+
+
+def test_creates_shift_rows_with_period_windows():
+    session = _ShiftSession()
+    created_uids = _create(session, [_item("morning")])
+
+    assert _created_periods(session) == [(PLAN_DATE, "morning")]
+    row = session.inserted_rows[0]
+    assert (row["start_time"], row["end_time"]) == compute_period_window(PLAN_DATE, "morning")
+    assert created_uids == [row["uid"]]
+    assert session.commits == 1
+
+
+def test_skips_on_grid_conflict():
+    start, end = compute_period_window(PLAN_DATE, "morning")
+    session = _ShiftSession([_existing(start, end, period="morning")])
+
+    _create(session, [_item("morning"), _item("afternoon")])
+    assert _created_periods(session) == [(PLAN_DATE, "afternoon")]
+
+
+def test_infers_period_of_legacy_on_grid_shift():
+    start, end = compute_period_window(PLAN_DATE, "afternoon")
+    session = _ShiftSession([_existing(start, end, period=None)])
+
+    _create(session, [_item("afternoon")])
+    assert session.inserted_rows == []
+    assert session.rollbacks == 1
+
+
+def test_skips_off_grid_overlap():
+    # 历史排班 10:15-11:15 不在任何时段网格上，但与上午时段重叠
+    legacy_start = datetime.combine(PLAN_DATE, time(10, 15), tzinfo=LOCAL_TIMEZONE)
+    session = _ShiftSession([_existing(legacy_start, legacy_start + timedelta(hours=1))])
+
+    _create(session, [_item("morning"), _item("afternoon")])
+    assert _created_periods(session) == [(PLAN_DATE, "afternoon")]
+
+
+def test_off_grid_shift_touching_period_is_not_a_conflict():
+    morning_start, _ = compute_period_window(PLAN_DATE, "morning")
+    session = _ShiftSession([_existing(morning_start - timedelta(hours=1), morning_start)])
+
+    _create(session, [_item("morning")])
+    assert _created_periods(session) == [(PLAN_DATE, "morning")]
+
+
+def test_cancelled_shift_does_not_conflict():
+    start, end = compute_period_window(PLAN_DATE, "morning")
+    legacy_start = datetime.combine(PLAN_DATE, time(10, 15), tzinfo=LOCAL_TIMEZONE)
+    session = _ShiftSession([
+        _existing(start, end, period="morning", is_cancelled=True),
+        _existing(legacy_start, legacy_start + timedelta(hours=1), is_cancelled=True),
+    ])
+
+    _create(session, [_item("morning")])
+    assert _created_periods(session) == [(PLAN_DATE, "morning")]
+
+
+def test_in_batch_duplicate_is_created_once():
+    session = _ShiftSession()
+    created_uids = _create(session, [_item("morning"), _item("morning"), _item("afternoon")])
+
+    assert _created_periods(session) == [(PLAN_DATE, "morning"), (PLAN_DATE, "afternoon")]
+    assert len(created_uids) == 2
+
+
+def test_rejects_unknown_location():
+    session = _ShiftSession(location_uids=["L1"])
+    with pytest.raises(ValueError, match="存在无效的地点"):
+        _create(session, [_item("morning", location_uid="L2")])
+    assert session.inserted_rows == []
+
+
+def test_ignores_dates_outside_plan_window():
+    session = _ShiftSession()
+    assert _create(session, [_item("morning", plan_date=PLAN_DATE - timedelta(days=2))]) == []
+    assert session.calls == 0
@@ -0,0 +1,128 @@
+"""区间索引与按小时时间槽掩码的测试。"""
+import random
+from datetime import date, datetime, time, timedelta
+
+import pytest
+
+from src.modules.schedule.service import (
+    LOCAL_TIMEZONE,
+    MINUTE_LABELS,
+    build_interval_index,
+    format_local_clock,
+    has_overlap,
+    hourly_slot_mask,
+    is_overlap,
+    slot_mask_labels,
+    to_epoch_seconds,
+)
+
+
+def test_build_interval_index_sorts_and_keeps_prefix_max_end():
+    starts, max_ends = build_interval_index([(50, 60), (0, 100), (10, 20)])
+    assert starts == [0, 10, 50]
+    # 长区间 [0, 100) 包住后面的短区间，前缀最大结束时间保持为 100
+    assert max_ends == [100, 100, 100]
+
+
+def test_build_interval_index_empty():
+    assert build_interval_index([]) == ([], [])
+    assert not has_overlap(build_interval_index([]), 0, 100)
+
+
+def test_has_overlap_treats_touching_intervals_as_free():
+    index = build_interval_index([(100, 200)])
+    assert not has_overlap(index, 0, 100)
+    assert not has_overlap(index, 200, 300)
+    assert has_overlap(index, 199, 300)
+    assert has_overlap(index, 0, 101)
+
+
+def test_has_overlap_sees_long_interval_behind_short_ones():
+    # 最近的开始时间对应的区间已结束，但更早开始的长区间仍覆盖查询范围
+    index = build_interval_index([(0, 1000), (100, 110), (200, 210)])
+    assert has_overlap(index, 500, 600)
+
+
+def test_has_overlap_with_zero_length_query():
+    index = build_interval_index([(100, 200)])
+    assert has_overlap(index, 150, 150)
+    assert not has_overlap(index, 100, 100)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_has_overlap_matches_pairwise_check(seed):
+    rng = random.Random(seed)
+    intervals = []
+    for _ in range(rng.randrange(0, 10)):
+        start = rng.randrange(0, 1000)
+        intervals.append((start, start + rng.randrange(0, 200)))
+    index = build_interval_index(intervals)
+
+    for _ in range(50):
+        start = rng.randrange(-100, 1100)
+        end = start + rng.randrange(0, 200)
+        expected = any(is_overlap(start, end, a, b) for a, b in intervals)
+        assert has_overlap(index, start, end) is expected
+
+
+def _local_ts(day: date, hour: int, minute: int = 0) -> int:
+    return to_epoch_seconds(datetime.combine(day, time(hour, minute), tzinfo=LOCAL_TIMEZONE))
+
+
+def _baseline_hourly_labels(start_ts: int, end_ts: int) -> list[str]:
+    """逐小时生成时间槽再按本地时间格式化，去重后按钟点排序。"""
+    labels = set()
+    current = start_ts
+    while current < end_ts:
+        labels.add(datetime.fromtimestamp(current, LOCAL_TIMEZONE).strftime("%H:%M"))
+        current += 3600
+    return sorted(labels)
+
+
+def test_hourly_slot_mask_generates_one_slot_per_hour():
+    day = date(2026, 3, 2)
+    mask = hourly_slot_mask(_local_ts(day, 8, 30), _local_ts(day, 12, 30))
+    assert slot_mask_labels(mask) == ["08:30", "09:30", "10:30", "11:30"]
+
+
+def test_hourly_slot_mask_includes_partial_last_hour():
+    day = date(2026, 3, 2)
+    mask = hourly_slot_mask(_local_ts(day, 14), _local_ts(day, 15, 10))
+    assert slot_mask_labels(mask) == ["14:00", "15:00"]
+
+
+def test_hourly_slot_mask_empty_or_inverted_range():
+    day = date(2026, 3, 2)
+    assert hourly_slot_mask(_local_ts(day, 9), _local_ts(day, 9)) == 0
+    assert hourly_slot_mask(_local_ts(day, 10), _local_ts(day, 9)) == 0
+    assert slot_mask_labels(0) == []
+
+
+def test_hourly_slot_mask_wraps_past_midnight():
+    day = date(2026, 3, 2)
+    start_ts = _local_ts(day, 22, 15)
+    end_ts = start_ts + 4 * 3600
+    assert slot_mask_labels(hourly_slot_mask(start_ts, end_ts)) == ["00:15", "01:15", "22:15", "23:15"]
+
+
+def test_hourly_slot_masks_merge_with_bitwise_or():
+    day = date(2026, 3, 2)
+    morning = hourly_slot_mask(_local_ts(day, 8, 30), _local_ts(day, 10, 30))
+    overlapping = hourly_slot_mask(_local_ts(day, 9, 30), _local_ts(day, 11, 30))
+    assert slot_mask_labels(morning | overlapping) == ["08:30", "09:30", "10:30"]
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_hourly_slot_mask_matches_strftime_loop(seed):
+    rng = random.Random(seed)
+    start = datetime(2026, 1, 1, tzinfo=LOCAL_TIMEZONE) + timedelta(minutes=rng.randrange(0, 60 * 24 * 60))
+    end = start + timedelta(minutes=rng.randrange(0, 60 * 30))
+    start_ts, end_ts = to_epoch_seconds(start), to_epoch_seconds(end)
+    assert slot_mask_labels(hourly_slot_mask(start_ts, end_ts)) == _baseline_hourly_labels(start_ts, end_ts)
+
+
+def test_format_local_clock_uses_local_timezone():
+    moment = datetime(2026, 3, 2, 1, 5, tzinfo=LOCAL_TIMEZONE)
+    assert format_local_clock(to_epoch_seconds(moment)) == "01:05"
+    assert MINUTE_LABELS[0] == "00:00"
+    assert MINUTE_LABELS[-1] == "23:59"
@@ -0,0 +1,123 @@
+"""套餐资格判定（服务位掩码）的测试，与按 frozenset 子集判断的基线逻辑比较。"""
+import asyncio
+import random
+
+import pytest
+
+from src.modules.schedule.service import (
+    ServiceCapabilities,
+    invalidate_capability_cache,
+    load_service_capabilities,
+    qualify_by_mask,
+)
+
+
+class _FakeResult:
+    def __init__(self, rows):
+        self._rows = rows
+
+    def all(self):
+        return list(self._rows)
+
+
+class _LinkSession:
+    """返回技师/房间与服务的关联行 (类型, ID, 服务 ID)。"""
+
+    def __init__(self, rows):
+        self._rows = rows
+        self.calls = 0
+
+    async def execute(self, statement):
+        self.calls += 1
+        return _FakeResult(self._rows)
+
+
+@pytest.fixture(autouse=True)
+def _fresh_capability_cache():
+    invalidate_capability_cache()
+    yield
+    invalidate_capability_cache()
+
+
+def _load(rows) -> ServiceCapabilities:
+    return asyncio.run(load_service_capabilities(_LinkSession(rows)))
+
+
+def _baseline_qualified(rows, kind, service_uids):
+    services_by_owner: dict[str, set[str]] = {}
+    for row_kind, owner_id, service_id in rows:
+        if row_kind == kind:
+            services_by_owner.setdefault(owner_id, set()).add(service_id)
+    required = frozenset(service_uids)
+    return [uid for uid, services in services_by_owner.items() if required <= services]
+
+
+LINKS = [
+    ("technician", "T1", "massage"),
+    ("technician", "T1", "foot"),
+    ("technician", "T2", "massage"),
+    ("resource", "R1", "massage"),
+    ("resource", "R1", "foot"),
+    ("resource", "R2", "foot"),
+]
+
+
+def test_qualifies_owners_that_cover_every_required_service():
+    capabilities = _load(LINKS)
+    required_mask = capabilities.required_mask(["massage", "foot"])
+
+    assert qualify_by_mask(capabilities.technician_masks, required_mask) == ["T1"]
+    assert qualify_by_mask(capabilities.resource_masks, required_mask) == ["R1"]
+
+
+def test_single_service_qualifies_every_linked_owner():
+    capabilities = _load(LINKS)
+    required_mask = capabilities.required_mask(["massage"])
+    assert qualify_by_mask(capabilities.technician_masks, required_mask) == ["T1", "T2"]
+
+
+def test_service_without_links_has_no_required_mask():
+    capabilities = _load(LINKS)
+    assert capabilities.required_mask(["massage", "unlinked"]) is None
+
+
+def test_empty_requirement_qualifies_everyone():
+    capabilities = _load(LINKS)
+    assert qualify_by_mask(capabilities.resource_masks, capabilities.required_mask([])) == ["R1", "R2"]
+
+
+def test_capabilities_are_cached_until_invalidated():
+    session = _LinkSession(LINKS)
+    asyncio.run(load_service_capabilities(session))
+    asyncio.run(load_service_capabilities(session))
+    assert session.calls == 1
+
+    invalidate_capability_cache()
+    asyncio.run(load_service_capabilities(session))
+    assert session.calls == 2
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_matches_frozenset_subset_baseline(seed):
+    rng = random.Random(seed)
+    services = [f"S{position}" for position in range(rng.randrange(1, 70))]
+    rows = [
+        (kind, f"{kind[0].upper()}{owner}", service)
+        for kind in ("technician", "resource")
+        for owner in range(rng.randrange(0, 8))
+        for service in rng.sample(services, rng.randrange(0, len(services) + 1))
+    ]
+    capabilities = _load(rows)
+    requested = rng.sample(services, rng.randrange(1, min(len(services), 4) + 1))
+
+    required_mask = capabilities.required_mask(requested)
+    if required_mask is None:
+        assert _baseline_qualified(rows, "technician", requested) == []
+        assert _baseline_qualified(rows, "resource", requested) == []
+        return
+    assert qualify_by_mask(capabilities.technician_masks, required_mask) == _baseline_qualified(
+        rows, "technician", requested
+    )
+    assert qualify_by_mask(capabilities.resource_masks, required_mask) == _baseline_qualified(
+        rows, "resource", requested
+    )
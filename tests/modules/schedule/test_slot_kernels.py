@@ -0,0 +1,205 @@
+"""时间槽位掩码内核与逐槽重叠检查（基线逻辑）的一致性测试。"""
+import random
+
+import pytest
+
+from src.modules.schedule.service import (
+    build_interval_index,
+    busy_slot_mask,
+    covered_slot_mask,
+    is_overlap,
+    match_package_slots,
+)
+
+
+def _mask_positions(mask: int) -> list[int]:
+    return [position for position in range(mask.bit_length()) if mask >> position & 1]
+
+
+def _baseline_busy(slot_starts, bookings, duration_s) -> list[int]:
+    return [
+        position
+        for position, slot_start in enumerate(slot_starts)
+        if any(is_overlap(slot_start, slot_start + duration_s, start, end) for start, end in bookings)
+    ]
+
+
+def _baseline_covered(slot_starts, shifts, duration_s) -> list[int]:
+    return [
+        position
+        for position, slot_start in enumerate(slot_starts)
+        if any(start <= slot_start and slot_start + duration_s <= end for start, end in shifts)
+    ]
+
+
+def _baseline_match(slot_starts, tech_entries, room_bookings, tech_duration_s, room_duration_s):
+    """逐个时间槽按顺序找第一个空闲房间和第一个在班且空闲的技师。"""
+    matches = []
+    for slot_start in slot_starts:
+        room_position = next(
+            (
+                position
+                for position, bookings in enumerate(room_bookings)
+                if not any(
+                    is_overlap(slot_start, slot_start + room_duration_s, start, end)
+                    for start, end in bookings
+                )
+            ),
+            None
+        )
+        if room_position is None:
+            continue
+        tech_position = next(
+            (
+                position
+                for position, (shifts, bookings) in enumerate(tech_entries)
+                if any(start <= slot_start and slot_start + tech_duration_s <= end for start, end in shifts)
+                and not any(
+                    is_overlap(slot_start, slot_start + tech_duration_s, start, end)
+                    for start, end in bookings
+                )
+            ),
+            None
+        )
+        if tech_position is None:
+            continue
+        matches.append((slot_start, tech_position, room_position))
+    return matches
+
+
+def _random_intervals(rng: random.Random, count: int, horizon: int) -> list[tuple[int, int]]:
+    intervals = []
+    for _ in range(count):
+        start = rng.randrange(0, horizon, 300)
+        intervals.append((start, start + rng.randrange(0, 7200, 300)))
+    return intervals
+
+
+# 以 10 分钟为步长的候选时间槽
+SLOT_STARTS = list(range(0, 4 * 3600, 600))
+
+
+def test_busy_slot_mask_back_to_back_booking_is_not_a_conflict():
+    # 占用 [3600, 7200)：结束于 3600 与开始于 7200 的时间槽均不冲突
+    index = build_interval_index([(3600, 7200)])
+    mask = busy_slot_mask(SLOT_STARTS, index, 1800)
+    assert _mask_positions(mask) == _baseline_busy(SLOT_STARTS, [(3600, 7200)], 1800)
+    assert SLOT_STARTS.index(1800) not in _mask_positions(mask)
+    assert SLOT_STARTS.index(7200) not in _mask_positions(mask)
+    assert SLOT_STARTS.index(2400) in _mask_positions(mask)
+
+
+def test_busy_slot_mask_touching_bookings_are_not_merged_over_gaps():
+    bookings = [(600, 1200), (1200, 1800), (3000, 3600)]
+    index = build_interval_index(bookings)
+    assert _mask_positions(busy_slot_mask(SLOT_STARTS, index, 600)) == _baseline_busy(
+        SLOT_STARTS, bookings, 600
+    )
+
+
+def test_busy_slot_mask_with_zero_duration():
+    bookings = [(1200, 2400)]
+    index = build_interval_index(bookings)
+    mask = busy_slot_mask(SLOT_STARTS, index, 0)
+    # 零时长时间槽只在严格落入占用内部时冲突
+    assert _mask_positions(mask) == _baseline_busy(SLOT_STARTS, bookings, 0)
+    assert _mask_positions(mask) == [SLOT_STARTS.index(1800)]
+
+
+def test_busy_slot_mask_without_bookings():
+    assert busy_slot_mask(SLOT_STARTS, build_interval_index([]), 1800) == 0
+
+
+def test_covered_slot_mask_requires_slot_inside_shift():
+    shifts = [(0, 3600), (7200, 9000)]
+    mask = covered_slot_mask(SLOT_STARTS, shifts, 1800)
+    assert _mask_positions(mask) == _baseline_covered(SLOT_STARTS, shifts, 1800)
+    # 结束时间恰好等于排班结束时仍可容纳
+    assert SLOT_STARTS.index(1800) in _mask_positions(mask)
+    assert SLOT_STARTS.index(2400) not in _mask_positions(mask)
+
+
+def test_covered_slot_mask_with_zero_duration_and_no_shifts():
+    shifts = [(1200, 2400)]
+    assert _mask_positions(covered_slot_mask(SLOT_STARTS, shifts, 0)) == _baseline_covered(
+        SLOT_STARTS, shifts, 0
+    )
+    assert covered_slot_mask(SLOT_STARTS, [], 1800) == 0
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_masks_match_baseline_on_random_intervals(seed):
+    rng = random.Random(seed)
+    bookings = _random_intervals(rng, rng.randrange(0, 8), 4 * 3600)
+    shifts = _random_intervals(rng, rng.randrange(0, 4), 4 * 3600)
+    duration_s = rng.choice([0, 600, 1800, 3600])
+
+    index = build_interval_index(bookings)
+    assert _mask_positions(busy_slot_mask(SLOT_STARTS, index, duration_s)) == _baseline_busy(
+        SLOT_STARTS, bookings, duration_s
+    )
+    assert _mask_positions(covered_slot_mask(SLOT_STARTS, shifts, duration_s)) == _baseline_covered(
+        SLOT_STARTS, shifts, duration_s
+    )
+
+
+def test_match_package_slots_prefers_first_free_technician_and_room():
+    tech_raw = [([(0, 3600)], [(0, 1800)]), ([(0, 7200)], [])]
+    room_raw = [[(600, 1800)], []]
+
+    matches = match_package_slots(
+        SLOT_STARTS,
+        [(shifts, build_interval_index(bookings)) for shifts, bookings in tech_raw],
+        [build_interval_index(bookings) for bookings in room_raw],
+        1800,
+        1800
+    )
+    assert matches == _baseline_match(SLOT_STARTS, tech_raw, room_raw, 1800, 1800)
+    # 第一位技师与第一个房间在 00:00 均被占用，顺延到下一位
+    assert matches[0] == (0, 1, 1)
+
+
+def test_match_package_slots_skips_technicians_without_shifts():
+    tech_entries = [([], build_interval_index([])), ([(3600, 7200)], build_interval_index([]))]
+    room_indexes = [build_interval_index([])]
+
+    matches = match_package_slots(SLOT_STARTS, tech_entries, room_indexes, 1800, 1800)
+    assert matches
+    assert all(tech_position == 1 for _, tech_position, _ in matches)
+    assert [slot for slot, _, _ in matches] == [3600, 4200, 4800, 5400]
+
+
+def test_match_package_slots_room_without_bookings_is_always_free():
+    tech_entries = [([(0, 4 * 3600)], build_interval_index([]))]
+    room_indexes = [build_interval_index([(0, 4 * 3600)]), build_interval_index([])]
+
+    matches = match_package_slots(SLOT_STARTS, tech_entries, room_indexes, 600, 600)
+    assert [slot for slot, _, _ in matches] == SLOT_STARTS
+    assert all(room_position == 1 for _, _, room_position in matches)
+
+
+def test_match_package_slots_without_technicians_or_rooms():
+    tech_entries = [([(0, 3600)], build_interval_index([]))]
+    assert match_package_slots(SLOT_STARTS, [], [build_interval_index([])], 600, 600) == []
+    assert match_package_slots(SLOT_STARTS, tech_entries, [], 600, 600) == []
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_match_package_slots_matches_baseline_on_random_schedules(seed):
+    rng = random.Random(seed)
+    tech_raw = [
+        (_random_intervals(rng, rng.randrange(0, 3), 4 * 3600), _random_intervals(rng, rng.randrange(0, 4), 4 * 3600))
+        for _ in range(rng.randrange(0, 4))
+    ]
+    room_raw = [_random_intervals(rng, rng.randrange(0, 4), 4 * 3600) for _ in range(rng.randrange(0, 3))]
+    tech_duration_s = rng.choice([0, 600, 1800])
+    room_duration_s = rng.choice([600, 1800, 3600])
+
+    matches = match_package_slots(
+        SLOT_STARTS,
+        [(shifts, build_interval_index(bookings)) for shifts, bookings in tech_raw],
+        [build_interval_index(bookings) for bookings in room_raw],
+        tech_duration_s,
+        room_duration_s
+    )
+    assert matches == _baseline_match(SLOT_STARTS, tech_raw, room_raw, tech_duration_s, room_duration_s)